@@ -2,13 +2,35 @@
 Kie.ai API Client
 Handles communication with Kie.ai video generation API
 """
-import httpx
+import os
+import asyncio
+import hashlib
 import json
-from typing import Optional, Dict, Any
+import weakref
+from typing import Optional, Dict, Any, List
 import logging
 
+from core.http_client import (
+    get_http_client, operation_timeout,
+    KIE_CREATE_TIMEOUT, KIE_STATUS_TIMEOUT, KIE_CREDIT_TIMEOUT
+)
+from core.rate_limit import kie_rate_limiter
+from core.retry import UpstreamError, call_with_retry, check_envelope, safe_to_repeat
+
 logger = logging.getLogger(__name__)
 
+# Max concurrent createTask calls per Kie.ai API key
+KIE_CREATE_CONCURRENCY = int(os.getenv("KIE_CREATE_CONCURRENCY", "3"))
+
+# Semaphores keyed by API key fingerprint, shared by all clients in this process;
+# an entry lives only while some create_tasks call holds its semaphore
+_create_semaphores: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = weakref.WeakValueDictionary()
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Stable, non-reversible identifier for an API key (safe for dict keys and logs)"""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
 
 class KieApiClient:
     """Client for Kie.ai Sora video generation API"""
@@ -16,11 +38,53 @@ class KieApiClient:
     BASE_URL = "https://api.kie.ai/api"
     
     def __init__(self, api_key: str):
-        self.api_key = api_key
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        self.key_id = key_fingerprint(api_key)
+    
+    def __repr__(self) -> str:
+        # Identify by fingerprint only so the key never ends up in logs
+        return f"KieApiClient(key_id={self.key_id})"
+    
+    async def _call(
+        self,
+        kind: str,
+        method: str,
+        path: str,
+        timeout: float,
+        idempotent: bool = True,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        One Kie.ai API call: waits for the key's `kind` rate budget, retries
+        transient failures (core.retry) and checks the response envelope
+        
+        Raises:
+            UpstreamError: classified failure (transient or permanent)
+        """
+        async def send() -> Dict[str, Any]:
+            # Queue behind this key's budget instead of hitting a 429
+            await kie_rate_limiter.acquire(self.key_id, kind)
+            response = await get_http_client().request(
+                method,
+                f"{self.BASE_URL}{path}",
+                headers=self.headers,
+                timeout=operation_timeout(timeout),
+                **kwargs
+            )
+            response.raise_for_status()
+            data = response.json()
+            check_envelope(data)
+            return data
+        
+        return await call_with_retry(
+            kind,
+            send,
+            idempotent=idempotent,
+            on_rate_limited=lambda seconds: kie_rate_limiter.pause(self.key_id, kind, seconds)
+        )
     
     async def create_task(
         self,
@@ -28,7 +92,9 @@ class KieApiClient:
         image_url: str,
         aspect_ratio: str = "portrait",
         n_frames: str = "10",
-        remove_watermark: bool = True
+        remove_watermark: bool = True,
+        callback_url: Optional[str] = None,
+        progress_callback_url: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Create a new video generation task
@@ -39,9 +105,13 @@ class KieApiClient:
             aspect_ratio: "portrait" or "landscape"
             n_frames: Number of frames "10" or "15"
             remove_watermark: Whether to remove watermark
+            callback_url: Optional URL Kie.ai POSTs the final result to
+            progress_callback_url: Optional URL Kie.ai POSTs progress updates to
             
         Returns:
-            Dict with task_id or error
+            Dict with task_id, or error (with "retryable" for failures that
+            may succeed if repeated and can't have created a task, and
+            "maybe_created" when Kie.ai may have acted on the request anyway)
         """
         payload = {
             "model": "sora-2-image-to-video",
@@ -53,52 +123,85 @@ class KieApiClient:
                 "remove_watermark": remove_watermark
             }
         }
+        if callback_url:
+            payload["callBackUrl"] = callback_url
+        if progress_callback_url:
+            payload["progressCallBackUrl"] = progress_callback_url
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.BASE_URL}/v1/jobs/createTask",
-                    json=payload,
-                    headers=self.headers
-                )
-                response.raise_for_status()
-                data = response.json()
-                logger.info(f"Kie.ai createTask raw response: {data}")
-                
-                if not data or not isinstance(data, dict):
-                    return {"success": False, "error": "Empty or invalid response from Kie.ai"}
-                
-                # Extract task_id from response (may be nested in data)
-                task_data = data.get("data") or data
-                task_id = task_data.get("taskId") or task_data.get("task_id") or task_data.get("id")
-                
-                if not task_id:
-                    logger.error(f"No task_id found in Kie.ai response: {data}")
-                    return {
-                        "success": False,
-                        "error": f"Kie.ai returned no task ID. Response: {str(data)[:200]}"
-                    }
-                
-                return {
-                    "success": True,
-                    "task_id": task_id,
-                    "status": "queued"
-                }
-                
-        except httpx.HTTPStatusError as e:
-            error_detail = e.response.text[:200] if e.response.text else "No details"
-            logger.error(f"Kie.ai API error: {e.response.status_code} - {error_detail}")
+            # Not idempotent: only retried when Kie.ai surely didn't take it
+            data = await self._call(
+                "create", "POST", "/v1/jobs/createTask", KIE_CREATE_TIMEOUT,
+                idempotent=False, json=payload
+            )
+        except UpstreamError as e:
+            logger.error(f"Kie.ai createTask failed: {e}")
             return {
                 "success": False,
-                "error": f"Kie.ai API Error ({e.response.status_code}): {error_detail}",
-                "detail": e.response.text
+                "error": str(e),
+                # A timeout or 5xx after sending may still have created the
+                # task; repeating it could create (and bill) a second video
+                "retryable": safe_to_repeat(e),
+                "maybe_created": e.transient and not safe_to_repeat(e)
             }
-        except Exception as e:
-            logger.error(f"Kie.ai request failed: {str(e)}")
+        
+        logger.info(f"Kie.ai createTask raw response: {data}")
+        
+        # Extract task_id from response (may be nested in data)
+        task_data = data.get("data") or data
+        task_id = task_data.get("taskId") or task_data.get("task_id") or task_data.get("id")
+        
+        if not task_id:
+            logger.error(f"No task_id found in Kie.ai response: {data}")
             return {
                 "success": False,
-                "error": str(e)
+                "error": f"Kie.ai returned no task ID. Response: {str(data)[:200]}"
             }
+        
+        return {
+            "success": True,
+            "task_id": task_id,
+            "status": "queued"
+        }
+    
+    async def create_tasks(
+        self,
+        prompts: List[str],
+        image_url: str,
+        aspect_ratio: str = "portrait",
+        n_frames: str = "10",
+        remove_watermark: bool = True,
+        callback_url: Optional[str] = None,
+        progress_callback_url: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Create one task per prompt concurrently
+        
+        Concurrency is capped per API key by KIE_CREATE_CONCURRENCY,
+        across every request using the same key in this process; the call
+        rate by the key's "create" token bucket (core.rate_limit).
+        
+        Returns:
+            List of create_task results, in the same order as prompts
+        """
+        semaphore = _create_semaphores.get(self.key_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(KIE_CREATE_CONCURRENCY)
+            _create_semaphores[self.key_id] = semaphore
+        
+        async def create_one(prompt: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.create_task(
+                    prompt=prompt,
+                    image_url=image_url,
+                    aspect_ratio=aspect_ratio,
+                    n_frames=n_frames,
+                    remove_watermark=remove_watermark,
+                    callback_url=callback_url,
+                    progress_callback_url=progress_callback_url
+                )
+        
+        return await asyncio.gather(*(create_one(p) for p in prompts))
     
     async def get_task_status(self, task_id: str) -> Dict[str, Any]:
         """
@@ -108,114 +211,112 @@ class KieApiClient:
             task_id: The task ID to check
             
         Returns:
-            Dict with status, progress, and video URL if completed
+            Dict with status, progress, and video URL if completed;
+            on failure success=False with error and "transient" (no status)
         """
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.BASE_URL}/v1/jobs/recordInfo",
-                    params={"taskId": task_id},
-                    headers=self.headers
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                if not data or not isinstance(data, dict):
-                    return {
-                        "success": False, "task_id": task_id,
-                        "status": "failed", "error": "Empty or invalid response from Kie.ai"
-                    }
-                
-                # API may wrap data in a "data" field
-                task_data = data.get("data") or data
-                
-                # Map API state to our status
-                api_state = task_data.get("state", "").lower()
-                status_map = {
-                    "waiting": "pending",
-                    "queuing": "queued",
-                    "generating": "processing",
-                    "success": "completed",
-                    "fail": "failed"
-                }
-                
-                status = status_map.get(api_state, "pending")
-                progress = task_data.get("progress", 0)
-                
-                # Estimate progress based on status if not provided
-                if progress == 0:
-                    if status == "queued":
-                        progress = 5
-                    elif status == "processing":
-                        progress = 50
-                    elif status == "completed":
-                        progress = 100
-                
-                result = {
-                    "success": True,
-                    "task_id": task_id,
-                    "status": status,
-                    "progress": progress
-                }
-                
-                if status == "completed":
-                    # Parse resultJson string to extract video URLs
-                    result_json_str = task_data.get("resultJson", "")
-                    if result_json_str:
-                        try:
-                            result_json = json.loads(result_json_str)
-                            urls = result_json.get("resultUrls", [])
-                            result["video_url"] = urls[0] if urls else None
-                        except (json.JSONDecodeError, IndexError):
-                            result["video_url"] = None
-                            logger.warning(f"Failed to parse resultJson: {result_json_str[:200]}")
-                    result["thumbnail_url"] = None
-                
-                if status == "failed":
-                    result["error"] = task_data.get("failMsg") or task_data.get("failCode") or "Generation failed"
-                
-                return result
-                
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Status check error: {e.response.status_code}")
+            data = await self._call(
+                "status", "GET", "/v1/jobs/recordInfo", KIE_STATUS_TIMEOUT,
+                params={"taskId": task_id}
+            )
+        except UpstreamError as e:
+            # No "status" on purpose: a failed check says nothing about the task
+            logger.error(f"Status check for {task_id} failed: {e}")
             return {
                 "success": False,
                 "task_id": task_id,
-                "status": "failed",
-                "error": f"API Error: {e.response.status_code}"
-            }
-        except Exception as e:
-            logger.error(f"Status check failed: {str(e)}")
-            return {
-                "success": False,
-                "task_id": task_id,
-                "status": "failed",
-                "error": str(e)
+                "error": str(e),
+                "transient": e.transient
             }
+        
+        # API may wrap data in a "data" field
+        task_data = data.get("data") or data
+        
+        return self.parse_task_record(task_id, task_data)
+    
+    @staticmethod
+    def parse_task_record(task_id: str, task_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Map a Kie.ai task record (recordInfo data or callback payload) to our status dict
+        
+        Args:
+            task_id: The task ID the record belongs to
+            task_data: The unwrapped "data" object from Kie.ai
+            
+        Returns:
+            Dict with status, progress, and video URL if completed;
+            "status" (and an estimated progress) is left out when the
+            record carries no known state, e.g. a bare progress callback
+        """
+        # Map API state to our status
+        api_state = (task_data.get("state") or "").lower()
+        status_map = {
+            "waiting": "pending",
+            "queuing": "queued",
+            "generating": "processing",
+            "success": "completed",
+            "fail": "failed"
+        }
+        
+        status = status_map.get(api_state)
+        progress = task_data.get("progress") or 0
+        
+        # Estimate progress based on status if not provided
+        if progress == 0:
+            if status == "queued":
+                progress = 5
+            elif status == "processing":
+                progress = 50
+            elif status == "completed":
+                progress = 100
+        
+        result = {
+            "success": True,
+            "task_id": task_id
+        }
+        if status is not None:
+            result["status"] = status
+        if status is not None or progress:
+            result["progress"] = progress
+        
+        if status == "completed":
+            # Parse resultJson string to extract video URLs
+            result_json_str = task_data.get("resultJson", "")
+            if result_json_str:
+                try:
+                    # Callbacks may deliver resultJson already decoded
+                    if isinstance(result_json_str, dict):
+                        result_json = result_json_str
+                    else:
+                        result_json = json.loads(result_json_str)
+                    urls = result_json.get("resultUrls", [])
+                    result["video_url"] = urls[0] if urls else None
+                except (json.JSONDecodeError, IndexError):
+                    result["video_url"] = None
+                    logger.warning(f"Failed to parse resultJson: {str(result_json_str)[:200]}")
+            result["thumbnail_url"] = None
+        
+        if status == "failed":
+            result["error"] = task_data.get("failMsg") or task_data.get("failCode") or "Generation failed"
+        
+        return result
     
     async def get_credit_balance(self) -> Dict[str, Any]:
         """Get current API credit balance"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                # Endpoint: https://api.kie.ai/api/v1/chat/credit
-                response = await client.get(
-                    f"{self.BASE_URL}/v1/chat/credit",
-                    headers=self.headers
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                # Response format: { "code": 200, "msg": "success", "data": 100 }
-                credits = data.get("data", 0)
-                
-                return {
-                    "success": True,
-                    "credits": credits
-                }
-                
-        except Exception as e:
-            logger.error(f"Credit check failed: {str(e)}")
+            # Endpoint: https://api.kie.ai/api/v1/chat/credit
+            data = await self._call("credit", "GET", "/v1/chat/credit", KIE_CREDIT_TIMEOUT)
+        except UpstreamError as e:
+            logger.error(f"Credit check failed: {e}")
             return {
                 "success": False,
                 "error": str(e)
             }
+        
+        # Response format: { "code": 200, "msg": "success", "data": 100 }
+        credits = data.get("data", 0)
+        
+        return {
+            "success": True,
+            "credits": credits
+        }
@@ -3,18 +3,25 @@ Authentication Module
 Google OAuth verification + JWT session management
 """
 import os
+import re
+import time
+import asyncio
 import logging
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 
 from jose import jwt, JWTError
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+from google.auth import jwt as google_jwt
 from fastapi import Depends, HTTPException, status, Request
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.database import get_db, User
+from core.cache import TTLCache
+from core.database import async_session, get_db, is_sqlite, CacheVersion, User
+from core.http_client import get_http_client, operation_timeout
 
 logger = logging.getLogger(__name__)
 
@@ -25,19 +32,230 @@ JWT_EXPIRY_HOURS = 72
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "")
 ADMIN_EMAILS = [e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()]
 
+# Google signing certificates
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_CERTS_TIMEOUT = float(os.getenv("GOOGLE_CERTS_TIMEOUT", "10"))
+GOOGLE_CERTS_DEFAULT_MAX_AGE = 3600
+GOOGLE_CERTS_REFRESH_MARGIN = 300
+# Unknown key ids force at most one refetch per interval
+GOOGLE_CERTS_MIN_FORCED_INTERVAL = float(os.getenv("GOOGLE_CERTS_MIN_FORCED_INTERVAL", "60"))
 
-def verify_google_token(token: str) -> dict:
+# Authenticated-user cache (per worker)
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+# How often each worker checks whether another one changed a user
+USER_CACHE_SYNC_INTERVAL = float(os.getenv("USER_CACHE_SYNC_INTERVAL", "2"))
+USER_CACHE_VERSION = "users"
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Identity, role and approval of a user, as cached by get_current_user"""
+    id: int
+    email: str
+    name: str
+    avatar_url: Optional[str]
+    role: str
+    is_approved: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "CachedUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            name=user.name,
+            avatar_url=user.avatar_url,
+            role=user.role,
+            is_approved=bool(user.is_approved),
+        )
+
+
+_user_cache: TTLCache[CachedUser] = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+async def invalidate_user_cache(db: AsyncSession, user_id: int):
+    """
+    Drop a cached user; call with any write to their row (role, approval,
+    profile, delete), before committing it.
+
+    Clears this worker at once and bumps the shared "users" version in the
+    same transaction, so every other worker's UserCacheSync drops its cache
+    within USER_CACHE_SYNC_INTERVAL.
+    """
+    _user_cache.invalidate(user_id)
+    now = datetime.utcnow()
+    insert = sqlite_insert if is_sqlite() else pg_insert
+    statement = insert(CacheVersion).values(name=USER_CACHE_VERSION, version=1, changed_at=now)
+    statement = statement.on_conflict_do_update(
+        index_elements=[CacheVersion.name],
+        set_={"version": CacheVersion.version + 1, "changed_at": now}
+    )
+    await db.execute(statement)
+
+
+class UserCacheSync:
+    """
+    Clears this worker's user cache whenever the shared "users" version moves,
+    i.e. another worker approved, revoked, edited or deleted a user.
+    """
+
+    def __init__(self):
+        self._version: Optional[int] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    async def check(self):
+        async with async_session() as db:
+            version = (await db.execute(
+                select(CacheVersion.version).where(CacheVersion.name == USER_CACHE_VERSION)
+            )).scalar() or 0
+        if self._version is not None and version != self._version:
+            _user_cache.clear()
+        self._version = version
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"User cache sync failed: {e}")
+                # Can't tell what changed; fall back to re-reading users
+                _user_cache.clear()
+            await asyncio.sleep(USER_CACHE_SYNC_INTERVAL)
+
+    async def start(self):
+        """Follow the shared version (called from the app lifespan)"""
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+
+user_cache_sync = UserCacheSync()
+
+
+class GoogleCertCache:
+    """
+    Google's OAuth2 signing certificates, cached per their Cache-Control max-age
+    and refreshed in the background shortly before they expire.
+    """
+
+    def __init__(self):
+        self._certs: dict = {}
+        self._expires_at: float = 0.0
+        self._refreshed_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._refresher: Optional[asyncio.Task] = None
+
+    def _fresh(self) -> bool:
+        return bool(self._certs) and time.monotonic() < self._expires_at
+
+    async def refresh(self) -> dict:
+        """Fetch the current certificates from Google"""
+        response = await get_http_client().get(
+            GOOGLE_CERTS_URL,
+            timeout=operation_timeout(GOOGLE_CERTS_TIMEOUT)
+        )
+        response.raise_for_status()
+        certs = response.json()
+
+        match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        max_age = int(match.group(1)) if match else GOOGLE_CERTS_DEFAULT_MAX_AGE
+
+        self._certs = certs
+        self._refreshed_at = time.monotonic()
+        self._expires_at = self._refreshed_at + max_age
+        logger.info(f"Google certs refreshed ({len(certs)} keys, max-age {max_age}s)")
+        return certs
+
+    async def get(self, force_refresh: bool = False) -> dict:
+        """Cached certificates, fetching them if missing or expired"""
+        if self._fresh() and not force_refresh:
+            return self._certs
+        async with self._lock:
+            # Another request may have refreshed while we waited
+            if self._fresh() and not force_refresh:
+                return self._certs
+            return await self.refresh()
+
+    async def get_for_unknown_key(self) -> dict:
+        """
+        Refetch for a token signed with a key id we don't have (Google rotated
+        its keys), unless we already refetched within GOOGLE_CERTS_MIN_FORCED_INTERVAL;
+        otherwise made-up key ids would turn every request into a fetch.
+        """
+        def recent() -> bool:
+            return (self._refreshed_at is not None
+                    and time.monotonic() - self._refreshed_at < GOOGLE_CERTS_MIN_FORCED_INTERVAL)
+
+        if recent():
+            return self._certs
+        async with self._lock:
+            if recent():
+                return self._certs
+            return await self.refresh()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.get(force_refresh=True)
+                delay = max(self._expires_at - time.monotonic() - GOOGLE_CERTS_REFRESH_MARGIN, 60)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Google certs refresh failed: {e}")
+                delay = 60
+            await asyncio.sleep(delay)
+
+    async def start(self):
+        """Warm the cache and keep it refreshed (called from the app lifespan)"""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+
+google_certs = GoogleCertCache()
+
+
+async def verify_google_token(token: str) -> dict:
     """
     Verify a Google ID token and return user info
+    Signature checks run in a worker thread against cached certificates.
 
     Returns:
         dict with email, name, picture
     """
     try:
-        idinfo = id_token.verify_oauth2_token(
+        certs = await google_certs.get()
+
+        # Google rotated its keys since the last refresh
+        key_id = google_jwt.decode_header(token).get("kid")
+        if key_id and key_id not in certs:
+            certs = await google_certs.get_for_unknown_key()
+            if key_id not in certs:
+                raise ValueError(f"Unknown signing key {key_id!r}")
+
+        idinfo = await asyncio.to_thread(
+            google_jwt.decode,
             token,
-            google_requests.Request(),
-            GOOGLE_CLIENT_ID
+            certs=certs,
+            audience=GOOGLE_CLIENT_ID
         )
 
         if idinfo["iss"] not in ["accounts.google.com", "https://accounts.google.com"]:
@@ -83,11 +301,17 @@ def decode_jwt(token: str) -> dict:
 async def get_current_user(
     request: Request,
     db: AsyncSession = Depends(get_db)
-) -> User:
+) -> CachedUser:
     """
     FastAPI dependency — extract and verify user from JWT token.
     Token can be in Authorization header or 'token' cookie.
+    The user row is cached for USER_CACHE_TTL seconds, or until any worker
+    invalidates it (see UserCacheSync).
     """
+    return await _authenticate(request, db)
+
+
+async def _authenticate(request: Request, db: AsyncSession) -> CachedUser:
     token = None
 
     # Check Authorization header
@@ -108,6 +332,10 @@ async def get_current_user(
     payload = decode_jwt(token)
     user_id = int(payload["sub"])
 
+    cached = _user_cache.get(user_id)
+    if cached:
+        return cached
+
     result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalar_one_or_none()
 
@@ -117,10 +345,12 @@ async def get_current_user(
             detail="User not found"
         )
 
-    return user
+    cached = CachedUser.from_user(user)
+    _user_cache.set(user_id, cached)
+    return cached
 
 
-async def require_approved(user: User = Depends(get_current_user)) -> User:
+async def require_approved(user: CachedUser = Depends(get_current_user)) -> CachedUser:
     """Dependency — require user to be approved"""
     if not user.is_approved:
         raise HTTPException(
@@ -130,7 +360,20 @@ async def require_approved(user: User = Depends(get_current_user)) -> User:
     return user
 
 
-async def require_admin(user: User = Depends(get_current_user)) -> User:
+async def require_approved_stream(request: Request) -> CachedUser:
+    """
+    Dependency — require_approved for long-lived responses (SSE streams)
+
+    Looks the user up in its own short session instead of get_db, whose
+    session would stay open, holding a pooled connection, until the
+    stream ends.
+    """
+    async with async_session() as db:
+        user = await _authenticate(request, db)
+    return await require_approved(user)
+
+
+async def require_admin(user: CachedUser = Depends(get_current_user)) -> CachedUser:
     """Dependency — require admin role"""
     if user.role != "admin":
         raise HTTPException(
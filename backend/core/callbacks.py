@@ -0,0 +1,90 @@
+"""
+Kie.ai Callback Module
+Builds callback URLs for createTask and verifies incoming webhook calls
+"""
+import os
+import hmac
+import time
+import base64
+import hashlib
+import logging
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Config from environment
+KIE_CALLBACK_ENABLED = os.getenv("KIE_CALLBACK_ENABLED", "false").lower() in ("1", "true", "yes")
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "").rstrip("/")
+# Signs the per-user URL tokens; callbacks stay off until one is set explicitly
+KIE_CALLBACK_SECRET = os.getenv("KIE_CALLBACK_SECRET", "")
+KIE_WEBHOOK_HMAC_KEY = os.getenv("KIE_WEBHOOK_HMAC_KEY", "")
+KIE_WEBHOOK_MAX_SKEW = int(os.getenv("KIE_WEBHOOK_MAX_SKEW", "300"))
+
+CALLBACK_PATH = "/api/callback/kie"
+PROGRESS_CALLBACK_PATH = "/api/callback/kie/progress"
+
+
+def callbacks_enabled() -> bool:
+    """Callbacks need the switch, a public URL Kie.ai can reach and a secret"""
+    return KIE_CALLBACK_ENABLED and bool(PUBLIC_BASE_URL) and bool(KIE_CALLBACK_SECRET)
+
+
+if KIE_CALLBACK_ENABLED and not KIE_CALLBACK_SECRET:
+    logger.warning("KIE_CALLBACK_ENABLED is set but KIE_CALLBACK_SECRET is empty; Kie.ai callbacks are disabled")
+
+
+def callback_token(user_id: int) -> str:
+    """Per-user token embedded in the callback URL"""
+    digest = hmac.new(KIE_CALLBACK_SECRET.encode(), f"kie-callback:{user_id}".encode(), hashlib.sha256)
+    return digest.hexdigest()
+
+
+def build_callback_urls(user_id: int) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Build (callBackUrl, progressCallBackUrl) for a user's tasks
+
+    Returns (None, None) when callbacks are disabled
+    """
+    if not callbacks_enabled():
+        return None, None
+    query = f"uid={user_id}&token={callback_token(user_id)}"
+    return (
+        f"{PUBLIC_BASE_URL}{CALLBACK_PATH}?{query}",
+        f"{PUBLIC_BASE_URL}{PROGRESS_CALLBACK_PATH}?{query}",
+    )
+
+
+def verify_callback_token(user_id: int, token: str) -> bool:
+    """Check the URL token issued by build_callback_urls"""
+    if not KIE_CALLBACK_SECRET:
+        return False
+    return hmac.compare_digest(callback_token(user_id), token or "")
+
+
+def verify_kie_signature(task_id: str, timestamp: Optional[str], signature: Optional[str]) -> bool:
+    """
+    Verify Kie.ai's webhook signature headers
+
+    Signature is base64(HMAC-SHA256("{taskId}.{timestamp}", KIE_WEBHOOK_HMAC_KEY)).
+    Skipped (returns True) when no HMAC key is configured; the URL token
+    still authenticates the caller in that case.
+    """
+    if not KIE_WEBHOOK_HMAC_KEY:
+        return True
+    if not timestamp or not signature:
+        return False
+
+    try:
+        ts = int(timestamp)
+    except ValueError:
+        return False
+    # Kie.ai may send seconds or milliseconds
+    if ts > 10 ** 12:
+        ts //= 1000
+    if abs(time.time() - ts) > KIE_WEBHOOK_MAX_SKEW:
+        logger.warning(f"Rejected Kie.ai callback for {task_id}: timestamp outside allowed skew")
+        return False
+
+    digest = hmac.new(KIE_WEBHOOK_HMAC_KEY.encode(), f"{task_id}.{timestamp}".encode(), hashlib.sha256).digest()
+    expected = base64.b64encode(digest).decode()
+    return hmac.compare_digest(expected, signature)
@@ -0,0 +1,94 @@
+"""
+Credit Balance Module
+Per-key TTL cache for Kie.ai credit lookups with single-flight upstream calls
+"""
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, Optional, Set
+
+from core.api_client import KieApiClient
+from core.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Cache config from environment
+CREDIT_CACHE_TTL = float(os.getenv("CREDIT_CACHE_TTL", "30"))
+CREDIT_CACHE_SIZE = int(os.getenv("CREDIT_CACHE_SIZE", "1000"))
+
+
+@dataclass(frozen=True)
+class CreditBalance:
+    """Result of a balance lookup"""
+    success: bool
+    credits: Optional[int] = None
+    error: Optional[str] = None
+    fetched_at: float = 0.0
+    cached: bool = False
+
+    @property
+    def age_seconds(self) -> float:
+        return max(0.0, time.monotonic() - self.fetched_at)
+
+
+class CreditBalanceCache:
+    """
+    Caches successful balance lookups per API key (by fingerprint)
+
+    Concurrent lookups for the same key share one in-flight upstream call;
+    failures are returned to every waiter but never cached.
+    """
+
+    def __init__(self, maxsize: int = CREDIT_CACHE_SIZE, ttl: float = CREDIT_CACHE_TTL):
+        self._cache: TTLCache[CreditBalance] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: Dict[str, "asyncio.Future[CreditBalance]"] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    async def get(self, client: KieApiClient, force_refresh: bool = False) -> CreditBalance:
+        """Cached balance for the client's key, fetching upstream when missing or stale"""
+        if not force_refresh:
+            cached = self._cache.get(client.key_id)
+            if cached:
+                return CreditBalance(
+                    success=True,
+                    credits=cached.credits,
+                    fetched_at=cached.fetched_at,
+                    cached=True,
+                )
+
+        inflight = self._inflight.get(client.key_id)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._fetch(client))
+            self._inflight[client.key_id] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(client.key_id, None))
+        # Shield so one cancelled request doesn't cancel the call for everyone else
+        return await asyncio.shield(inflight)
+
+    async def _fetch(self, client: KieApiClient) -> CreditBalance:
+        result = await client.get_credit_balance()
+        fetched_at = time.monotonic()
+        if not result.get("success"):
+            return CreditBalance(
+                success=False,
+                error=result.get("error", "Failed to check balance"),
+                fetched_at=fetched_at,
+            )
+
+        balance = CreditBalance(success=True, credits=result.get("credits", 0), fetched_at=fetched_at)
+        self._cache.set(client.key_id, balance)
+        return balance
+
+    def refresh_soon(self, client: KieApiClient):
+        """Refresh a key's balance in the background (e.g. after tasks spend credits)"""
+        self._cache.invalidate(client.key_id)
+        task = asyncio.create_task(self.get(client, force_refresh=True))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def invalidate(self, client: KieApiClient):
+        self._cache.invalidate(client.key_id)
+
+
+credit_balances = CreditBalanceCache()
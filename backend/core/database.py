@@ -1,15 +1,57 @@
 """
-Database Module — SQLite with SQLAlchemy
+Database Module — SQLAlchemy (SQLite by default, PostgreSQL via asyncpg)
 Handles user and API key storage
 """
 import os
 import asyncio
+import logging
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, create_engine, event
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, create_engine, event, text
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 
-DATABASE_URL = "sqlite+aiosqlite:///./data/app.db"
+# e.g. postgresql+asyncpg://user:pass@db:5432/affgen for multi-worker deployments
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./data/app.db")
+
+# Storage profile: "tuned" (WAL + pragmas below) or "default" (SQLite defaults)
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "tuned")
+
+SQLITE_PROFILES = {
+    "default": {},
+    "tuned": {
+        # Readers no longer block the writer (and vice versa)
+        "journal_mode": "WAL",
+        # Safe with WAL; fsync only at checkpoints
+        "synchronous": "NORMAL",
+        # Wait for locks instead of failing with "database is locked"
+        "busy_timeout": 5000,
+        # Negative = KiB (64 MB page cache per connection)
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+}
+
+# Connection pool sizing
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Recycle server-side connections before typical proxy/idle timeouts (PostgreSQL)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+
+def is_sqlite(url: str = DATABASE_URL) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def is_memory_sqlite(url: str = DATABASE_URL) -> bool:
+    """In-memory SQLite, which SQLAlchemy serves from a single-connection StaticPool"""
+    if not is_sqlite(url):
+        return False
+    parsed = make_url(url)
+    database = parsed.database or ""
+    return database in ("", ":memory:") or parsed.query.get("mode") == "memory"
 
 Base = declarative_base()
 
@@ -27,6 +69,8 @@ class User(Base):
 
     api_keys = relationship("UserApiKey", back_populates="user", uselist=False)
     tasks = relationship("VideoTask", back_populates="user", cascade="all, delete-orphan")
+    generation_jobs = relationship("GenerationJob", cascade="all, delete-orphan")
+    task_list_version = relationship("TaskListVersion", uselist=False, cascade="all, delete-orphan")
 
 
 class UserApiKey(Base):
@@ -40,11 +84,28 @@ class UserApiKey(Base):
     user = relationship("User", back_populates="api_keys")
 
 
+# Statuses the poller still syncs (matches core.task_sync.ACTIVE_STATUSES).
+# Kept as literal SQL so queries can match the partial index predicate exactly.
+ACTIVE_TASK_FILTER = text("status IN ('pending', 'queued', 'processing')")
+
+
 class VideoTask(Base):
     __tablename__ = "video_tasks"
+    __table_args__ = (
+        # History listing: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_video_tasks_user_created", "user_id", "created_at", "id"),
+        # Per-user status filters
+        Index("ix_video_tasks_user_status", "user_id", "status"),
+        # Poller: only the (few) active rows are indexed
+        Index(
+            "ix_video_tasks_active", "status",
+            sqlite_where=ACTIVE_TASK_FILTER,
+            postgresql_where=ACTIVE_TASK_FILTER
+        ),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     kie_task_id = Column(String, index=True)
     product_name = Column(String, nullable=True)
     style = Column(String, nullable=True)
@@ -59,16 +120,142 @@ class VideoTask(Base):
     user = relationship("User", back_populates="tasks")
 
 
+class TaskListVersion(Base):
+    """Per-user change counter for video_tasks (ETag of /api/tasks, see core.task_versions)"""
+    __tablename__ = "task_list_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class CacheVersion(Base):
+    """Named change counters that tell every worker to drop an in-memory cache (see core.auth)"""
+    __tablename__ = "cache_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class GenerationJob(Base):
+    """One queued Kie.ai task creation (see core.generation_queue)"""
+    __tablename__ = "generation_jobs"
+    __table_args__ = (
+        # Claim query: due queued jobs and expired leases
+        Index("ix_generation_jobs_claim", "status", "next_attempt_at"),
+        Index("ix_generation_jobs_user_batch", "user_id", "batch_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    batch_id = Column(String, nullable=False)  # one generate request
+    item_index = Column(Integer, default=0)
+    prompt = Column(String, nullable=False)
+    image_url = Column(String, nullable=False)
+    aspect_ratio = Column(String, default="portrait")
+    n_frames = Column(String, default="10")
+    remove_watermark = Column(Boolean, default=True)
+    product_name = Column(String, nullable=True)
+    style = Column(String, nullable=True)
+    status = Column(String, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    locked_until = Column(DateTime, nullable=True)  # lease while running
+    sent_at = Column(DateTime, nullable=True)  # createTask may have reached Kie.ai
+    kie_task_id = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class UploadedImage(Base):
+    """Content-addressed record of images already on Cloudinary (upload dedupe)"""
+    __tablename__ = "uploaded_images"
+    __table_args__ = (
+        Index("ux_uploaded_images_cloud_hash", "cloud_name", "content_hash", unique=True),
+        # Eviction: least recently used first
+        Index("ix_uploaded_images_last_used", "last_used_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cloud_name = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=False)  # SHA-256 hex of the original upload
+    secure_url = Column(String, nullable=False)
+    public_id = Column(String, nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    size_bytes = Column(Integer, nullable=True)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+    verified_at = Column(DateTime, default=datetime.utcnow)
+
+
+def sqlite_pragmas(profile: str) -> dict:
+    """
+    Pragmas for a storage profile, with per-pragma env overrides
+    (e.g. SQLITE_BUSY_TIMEOUT=10000, SQLITE_MMAP_SIZE=0)
+    """
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE '{profile}'. Options: {', '.join(SQLITE_PROFILES)}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    for name in SQLITE_PROFILES["tuned"]:
+        override = os.getenv(f"SQLITE_{name.upper()}")
+        if override:
+            pragmas[name] = override
+    return pragmas
+
+
+def build_engine(url: str, profile: str = SQLITE_PROFILE):
+    """
+    Create the async engine
+    SQLite gets the storage profile pragmas on connect; server databases
+    get pre-ping and recycling so pooled connections survive restarts.
+    Pool sizing only applies to QueuePool engines (not in-memory SQLite).
+    """
+    pool_options = {}
+    if not is_memory_sqlite(url):
+        pool_options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    if not is_sqlite(url):
+        pool_options["pool_pre_ping"] = True
+        pool_options["pool_recycle"] = DB_POOL_RECYCLE
+
+    engine = create_async_engine(url, echo=False, **pool_options)
+
+    pragmas = sqlite_pragmas(profile) if is_sqlite(url) else {}
+    if pragmas:
+        @event.listens_for(engine.sync_engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return engine
+
+
 # Engine and session
-engine = create_async_engine(DATABASE_URL, echo=False)
+engine = build_engine(DATABASE_URL)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
 async def init_db():
-    """Create all tables and ensure data directory exists"""
-    os.makedirs("data", exist_ok=True)
+    """Ensure the SQLite data directory exists and apply pending schema migrations"""
+    from core.migrations import run_migrations
+
+    if is_sqlite():
+        db_path = make_url(DATABASE_URL).database
+        if db_path and not is_memory_sqlite():
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        applied = await conn.run_sync(run_migrations)
+    if applied:
+        logging.getLogger(__name__).info(f"Applied migrations: {applied}")
 
 
 async def get_db():
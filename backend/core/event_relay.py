@@ -0,0 +1,106 @@
+"""
+Event Relay Module
+Forwards task changes made by other processes to this process's SSE subscribers
+
+task_events only reaches subscribers in the process that made a change, but
+the poller runs on one leader, callbacks land on any worker and queue jobs
+run wherever they were claimed. Each process therefore watches the
+task_list_versions rows of its own subscribers (one primary-key read per
+interval, only while someone is connected) and, when a version moved,
+re-publishes the user's recently updated rows. Deltas are full row states,
+so an event delivered both locally and by the relay is harmless.
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+
+from core.database import async_session, TaskListVersion, VideoTask
+from core.events import task_events
+
+logger = logging.getLogger(__name__)
+
+# Relay config from environment
+TASK_EVENT_RELAY_INTERVAL = float(os.getenv("TASK_EVENT_RELAY_INTERVAL", "2"))
+# Rows updated this long before the previous check are re-sent too (commit
+# latency and clock skew between hosts)
+TASK_EVENT_RELAY_SLACK = float(os.getenv("TASK_EVENT_RELAY_SLACK", "10"))
+
+
+class TaskEventRelay:
+    """Polls subscribed users' task list versions and re-publishes their changes"""
+
+    def __init__(self):
+        # user_id -> (last seen version, when it was read)
+        self._seen: Dict[int, Tuple[int, datetime]] = {}
+        self._runner: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the relay loop (called from the app lifespan)"""
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.relay_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Task event relay failed: {e}")
+            await asyncio.sleep(TASK_EVENT_RELAY_INTERVAL)
+
+    async def relay_once(self) -> int:
+        """
+        One check of every subscribed user
+
+        Returns:
+            Number of deltas published
+        """
+        user_ids = task_events.subscribed_users()
+        for user_id in list(self._seen):
+            if user_id not in user_ids:
+                del self._seen[user_id]
+        if not user_ids:
+            return 0
+
+        now = datetime.utcnow()
+        published = 0
+        async with async_session() as db:
+            versions = dict((await db.execute(
+                select(TaskListVersion.user_id, TaskListVersion.version)
+                .where(TaskListVersion.user_id.in_(user_ids))
+            )).all())
+
+            for user_id in user_ids:
+                version = versions.get(user_id, 0)
+                seen = self._seen.get(user_id)
+                self._seen[user_id] = (version, now)
+                if seen is not None and seen[0] == version:
+                    continue
+
+                # New subscribers also get the last few seconds, covering
+                # changes between their listing fetch and this first check
+                since = (seen[1] if seen else now) - timedelta(seconds=TASK_EVENT_RELAY_SLACK)
+                rows = (await db.execute(
+                    select(VideoTask).where(VideoTask.user_id == user_id, VideoTask.updated_at >= since)
+                )).scalars().all()
+                for task in rows:
+                    task_events.publish_task(task)
+                published += len(rows)
+        return published
+
+
+task_event_relay = TaskEventRelay()
@@ -0,0 +1,80 @@
+"""
+Task Events Module
+In-process pub/sub that fans VideoTask changes out to live subscribers (SSE)
+
+Writers publish in their own process only; changes made by other workers
+or replicas reach this process's subscribers through core.event_relay.
+"""
+import os
+import asyncio
+import logging
+from typing import Dict, Any, Set
+
+logger = logging.getLogger(__name__)
+
+# Max undelivered events buffered per subscriber before the oldest are dropped
+TASK_EVENT_QUEUE_SIZE = int(os.getenv("TASK_EVENT_QUEUE_SIZE", "100"))
+
+
+def task_delta(task) -> Dict[str, Any]:
+    """Build the delta payload for a VideoTask row"""
+    return {
+        "task_id": task.kie_task_id,
+        "status": task.status,
+        "progress": task.progress or 0,
+        "video_url": task.video_url,
+        "thumbnail_url": task.thumbnail_url,
+        "error": task.error,
+        "created_at": task.created_at.isoformat() if task.created_at else None,
+    }
+
+
+class TaskEventBus:
+    """Per-user fan-out of task deltas to every connected tab"""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """Register a new subscriber queue for a user"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=TASK_EVENT_QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        """Remove a subscriber queue"""
+        queues = self._subscribers.get(user_id)
+        if not queues:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def has_subscribers(self, user_id: int) -> bool:
+        return bool(self._subscribers.get(user_id))
+
+    def subscribed_users(self) -> Set[int]:
+        """Users with at least one live subscriber in this process"""
+        return set(self._subscribers)
+
+    def publish(self, user_id: int, event: Dict[str, Any]):
+        """
+        Deliver an event to all of a user's subscribers without blocking
+
+        A slow subscriber loses its oldest buffered event rather than
+        holding up the publisher.
+        """
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+    def publish_task(self, task):
+        """Publish the current state of a VideoTask row"""
+        self.publish(task.user_id, task_delta(task))
+
+
+task_events = TaskEventBus()
@@ -0,0 +1,454 @@
+"""
+Generation Queue Module
+Durable job table + worker pool that creates Kie.ai tasks in the background
+
+/api/generate-task only enqueues one GenerationJob per prompt and returns.
+Workers started from the app lifespan claim due jobs, call createTask and
+record the VideoTask row, so a client disconnect or a restart no longer
+loses half a batch.
+
+A job is claimed with a lease (locked_until) and marked sent (sent_at)
+right before createTask goes out. One rule covers every way an attempt
+can end without a task ID:
+- not sent (the worker died before the call, or Kie.ai surely never acted
+  on it: connection refused, 429/503): retried, up to GEN_JOB_MAX_ATTEMPTS;
+- sent, outcome unknown (the lease expired mid-call, 5xx, read timeout):
+  failed, never re-created, since Kie.ai may have created and billed it.
+So a job never creates the same video twice. Claiming is a conditional
+UPDATE, so any number of workers/replicas can share the table on SQLite or
+PostgreSQL.
+"""
+import os
+import time
+import uuid
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, delete, insert, or_, select, update
+
+from core.callbacks import build_callback_urls
+from core.credits import credit_balances
+from core.database import async_session, GenerationJob, VideoTask
+from core.events import task_events
+from core.task_versions import bump_task_versions
+from core.user_keys import get_kie_client, ApiKeyUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Queue config from environment
+GEN_QUEUE_WORKERS = int(os.getenv("GEN_QUEUE_WORKERS", "4"))
+GEN_QUEUE_POLL = float(os.getenv("GEN_QUEUE_POLL", "2"))
+GEN_JOB_MAX_ATTEMPTS = int(os.getenv("GEN_JOB_MAX_ATTEMPTS", "5"))
+# Renewed every third of its length while the worker is alive (waits on the
+# key's rate budget can be long); expiry means the worker died
+GEN_JOB_LEASE = float(os.getenv("GEN_JOB_LEASE", "120"))
+GEN_JOB_RETRY_BASE = float(os.getenv("GEN_JOB_RETRY_BASE", "5"))
+GEN_JOB_RETRY_MAX = float(os.getenv("GEN_JOB_RETRY_MAX", "300"))
+# Finished jobs are kept this long for /api/generate-jobs, then pruned
+GEN_JOB_RETENTION_HOURS = float(os.getenv("GEN_JOB_RETENTION_HOURS", "72"))
+
+JOB_PENDING_STATUSES = ("queued", "running")
+
+_PRUNE_INTERVAL = 3600
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter after the given number of failed attempts"""
+    delay = min(GEN_JOB_RETRY_BASE * (2 ** max(attempts - 1, 0)), GEN_JOB_RETRY_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _lease_expired(now: datetime):
+    """Running jobs whose worker died"""
+    return and_(GenerationJob.status == "running", GenerationJob.locked_until < now)
+
+
+def _claimable(now: datetime):
+    """Due queued jobs, and orphaned running jobs that were not sent and have attempts left"""
+    return or_(
+        and_(GenerationJob.status == "queued", GenerationJob.next_attempt_at <= now),
+        and_(
+            _lease_expired(now),
+            GenerationJob.sent_at.is_(None),
+            GenerationJob.attempts < GEN_JOB_MAX_ATTEMPTS,
+        ),
+    )
+
+
+def _unrecoverable(now: datetime):
+    """Orphaned running jobs that were sent or used every attempt"""
+    return and_(
+        _lease_expired(now),
+        or_(GenerationJob.sent_at.is_not(None), GenerationJob.attempts >= GEN_JOB_MAX_ATTEMPTS),
+    )
+
+
+def _maybe_created_error(error: str) -> str:
+    return f"{error}. Kie.ai may still have created this video; check before generating it again"
+
+
+def placeholder_task_id(job_id: int) -> str:
+    """kie_task_id of the failed VideoTask row recorded for a job that never got a Kie.ai task"""
+    return f"job-{job_id}"
+
+
+def _task_event(kie_task_id: str, status: str, error: Optional[str], created_at: datetime) -> Dict[str, Any]:
+    return {
+        "task_id": kie_task_id,
+        "status": status,
+        "progress": 0,
+        "video_url": None,
+        "thumbnail_url": None,
+        "error": error,
+        "created_at": created_at.isoformat()
+    }
+
+
+class GenerationQueue:
+    """Pool of workers draining the generation_jobs table"""
+
+    def __init__(self):
+        self._workers: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._last_prune = 0.0
+
+    async def start(self):
+        """Start the worker pool (called from the app lifespan)"""
+        if self._workers:
+            return
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._run(worker_id)) for worker_id in range(max(GEN_QUEUE_WORKERS, 1))
+        ]
+        logger.info(f"Generation queue started with {len(self._workers)} workers")
+
+    async def stop(self):
+        """
+        Stop the workers
+
+        A job interrupted mid-call stays "running" until its lease expires,
+        then it is failed if createTask was sent, else retried (by another
+        replica, or by us after restart).
+        """
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+
+    def notify(self):
+        """Wake idle workers (new jobs were committed)"""
+        self._wakeup.set()
+
+    async def enqueue(
+        self,
+        db,
+        user_id: int,
+        prompts: List[str],
+        image_url: str,
+        aspect_ratio: str,
+        n_frames: str,
+        remove_watermark: bool,
+        product_name: Optional[str],
+        style: Optional[str]
+    ) -> str:
+        """
+        Persist one job per prompt and wake the workers
+
+        Returns:
+            batch_id grouping the jobs (see /api/generate-jobs/{batch_id})
+        """
+        batch_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        await db.execute(insert(GenerationJob), [
+            {
+                "user_id": user_id,
+                "batch_id": batch_id,
+                "item_index": index,
+                "prompt": prompt,
+                "image_url": image_url,
+                "aspect_ratio": aspect_ratio,
+                "n_frames": n_frames,
+                "remove_watermark": remove_watermark,
+                "product_name": product_name,
+                "style": style,
+                "status": "queued",
+                "attempts": 0,
+                "next_attempt_at": now,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for index, prompt in enumerate(prompts)
+        ])
+        await db.commit()
+        self.notify()
+        return batch_id
+
+    async def _run(self, worker_id: int):
+        while True:
+            try:
+                job = await self.claim()
+                if job is not None:
+                    await self._process_leased(job)
+                    continue
+                if worker_id == 0 and time.monotonic() - self._last_prune > _PRUNE_INTERVAL:
+                    self._last_prune = time.monotonic()
+                    await self.prune()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Generation worker {worker_id} failed: {e}")
+
+            # Idle: sleep until new work is enqueued or retries come due
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=GEN_QUEUE_POLL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def claim(self) -> Optional[GenerationJob]:
+        """
+        Take the lease on one due job
+
+        Candidates are read first, then claimed with an UPDATE that repeats
+        the due condition; only the worker whose UPDATE matched owns the job.
+        Orphaned jobs that were sent, or already used every attempt, are
+        failed instead.
+        """
+        await self._fail_orphaned()
+        async with async_session() as db:
+            now = datetime.utcnow()
+            candidates = (await db.execute(
+                select(GenerationJob.id)
+                .where(_claimable(now))
+                .order_by(GenerationJob.next_attempt_at, GenerationJob.id)
+                .limit(max(GEN_QUEUE_WORKERS, 1) * 2)
+            )).scalars().all()
+
+            for job_id in candidates:
+                claimed = await db.execute(
+                    update(GenerationJob)
+                    .where(GenerationJob.id == job_id, _claimable(now))
+                    .values(
+                        status="running",
+                        attempts=GenerationJob.attempts + 1,
+                        locked_until=now + timedelta(seconds=GEN_JOB_LEASE),
+                        updated_at=now,
+                    )
+                )
+                await db.commit()
+                if claimed.rowcount == 1:
+                    return await db.get(GenerationJob, job_id)
+            return None
+
+    async def _fail_orphaned(self):
+        """Fail orphaned running jobs that must not be retried (see _unrecoverable)"""
+        async with async_session() as db:
+            now = datetime.utcnow()
+            orphaned = (await db.execute(
+                select(GenerationJob)
+                .where(_unrecoverable(now))
+                .limit(max(GEN_QUEUE_WORKERS, 1) * 2)
+            )).scalars().all()
+
+            for job in orphaned:
+                # Take the lease first so only one worker records the failure
+                claimed = await db.execute(
+                    update(GenerationJob)
+                    .where(GenerationJob.id == job.id, _unrecoverable(now))
+                    .values(locked_until=now + timedelta(seconds=GEN_JOB_LEASE), updated_at=now)
+                )
+                await db.commit()
+                if claimed.rowcount != 1:
+                    continue
+                if job.sent_at is not None:
+                    error = _maybe_created_error("Task creation was interrupted after the request was sent")
+                else:
+                    error = f"Task creation was interrupted on the last of {job.attempts} attempts"
+                await self._finish_failed(job, error)
+
+    async def _process_leased(self, job: GenerationJob):
+        """process() while renewing the job's lease in the background"""
+        renewer = asyncio.create_task(self._renew_lease(job.id))
+        try:
+            await self.process(job)
+        finally:
+            renewer.cancel()
+            try:
+                await renewer
+            except asyncio.CancelledError:
+                pass
+
+    async def _renew_lease(self, job_id: int):
+        while True:
+            await asyncio.sleep(GEN_JOB_LEASE / 3)
+            try:
+                async with async_session() as db:
+                    await db.execute(
+                        update(GenerationJob)
+                        .where(GenerationJob.id == job_id, GenerationJob.status == "running")
+                        .values(locked_until=datetime.utcnow() + timedelta(seconds=GEN_JOB_LEASE))
+                    )
+                    await db.commit()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Could not renew lease of generation job {job_id}: {e}")
+
+    async def process(self, job: GenerationJob):
+        """Create the Kie.ai task for a claimed job and record the outcome"""
+        try:
+            async with async_session() as db:
+                client = await get_kie_client(db, job.user_id)
+        except ApiKeyUnavailable:
+            # Removed or replaced since enqueue; retrying won't help
+            await self._finish_failed(job, "No valid Kie.ai API key configured. Go to Settings to add your key.")
+            return
+
+        callback_url, progress_callback_url = build_callback_urls(job.user_id)
+        await self._mark_sent(job)
+
+        # Same per-key concurrency cap as interactive batches
+        result = (await client.create_tasks(
+            prompts=[job.prompt],
+            image_url=job.image_url,
+            aspect_ratio=job.aspect_ratio,
+            n_frames=job.n_frames,
+            remove_watermark=job.remove_watermark,
+            callback_url=callback_url,
+            progress_callback_url=progress_callback_url
+        ))[0]
+
+        task_id = result.get("task_id") if result.get("success") else None
+        if task_id:
+            await self._finish_created(job, task_id)
+        else:
+            error = result.get("error") if not result.get("success") else "Task created but no ID returned"
+            error = error or "Unknown error"
+            if result.get("retryable") and job.attempts < GEN_JOB_MAX_ATTEMPTS:
+                await self._retry_later(job, error)
+                return
+            if result.get("maybe_created"):
+                error = _maybe_created_error(error)
+            await self._finish_failed(job, error)
+
+        # Tasks spend credits one by one, but one balance refresh per batch is enough
+        if await self._batch_finished(job.batch_id):
+            credit_balances.refresh_soon(client)
+
+    async def _mark_sent(self, job: GenerationJob):
+        """Committed before createTask, so an interrupted call is never repeated"""
+        now = datetime.utcnow()
+        async with async_session() as db:
+            await db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job.id, GenerationJob.status == "running")
+                .values(sent_at=now, updated_at=now)
+            )
+            await db.commit()
+        job.sent_at = now
+
+    async def _batch_finished(self, batch_id: str) -> bool:
+        """True once no job of the batch is queued or running"""
+        async with async_session() as db:
+            pending = (await db.execute(
+                select(GenerationJob.id)
+                .where(GenerationJob.batch_id == batch_id, GenerationJob.status.in_(JOB_PENDING_STATUSES))
+                .limit(1)
+            )).first()
+        return pending is None
+
+    async def _finish_created(self, job: GenerationJob, task_id: str):
+        """Record the VideoTask and close the job in one transaction"""
+        now = datetime.utcnow()
+        async with async_session() as db:
+            await db.execute(insert(VideoTask), [{
+                "user_id": job.user_id,
+                "kie_task_id": task_id,
+                "product_name": job.product_name,
+                "style": job.style,
+                "status": "pending",
+                "progress": 0,
+                "created_at": now,
+            }])
+            await db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job.id)
+                .values(status="done", kie_task_id=task_id, error=None, locked_until=None, updated_at=now)
+            )
+            await bump_task_versions(db, [job.user_id])
+            await db.commit()
+        task_events.publish(job.user_id, _task_event(task_id, "pending", None, now))
+
+    async def _retry_later(self, job: GenerationJob, error: str):
+        delay = retry_delay(job.attempts)
+        now = datetime.utcnow()
+        logger.warning(
+            f"Generation job {job.id} attempt {job.attempts}/{GEN_JOB_MAX_ATTEMPTS} failed, "
+            f"retrying in {delay:.0f}s: {error}"
+        )
+        async with async_session() as db:
+            await db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job.id, GenerationJob.status == "running")
+                .values(
+                    status="queued",
+                    error=error,
+                    locked_until=None,
+                    # Only reached when Kie.ai surely didn't act on the call
+                    sent_at=None,
+                    next_attempt_at=now + timedelta(seconds=delay),
+                    updated_at=now,
+                )
+            )
+            await db.commit()
+
+    async def _finish_failed(self, job: GenerationJob, error: str):
+        """
+        Give up on a job; a failed VideoTask row (no Kie.ai ID, so a
+        "job-<id>" placeholder) makes the failure visible in the dashboard
+        """
+        logger.error(f"Generation job {job.id} failed after {job.attempts} attempt(s): {error}")
+        now = datetime.utcnow()
+        placeholder_id = placeholder_task_id(job.id)
+        async with async_session() as db:
+            await db.execute(insert(VideoTask), [{
+                "user_id": job.user_id,
+                "kie_task_id": placeholder_id,
+                "product_name": job.product_name,
+                "style": job.style,
+                "status": "failed",
+                "progress": 0,
+                "error": error,
+                "created_at": now,
+            }])
+            await db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job.id)
+                .values(status="failed", error=error, locked_until=None, updated_at=now)
+            )
+            await bump_task_versions(db, [job.user_id])
+            await db.commit()
+        task_events.publish(job.user_id, _task_event(placeholder_id, "failed", error, now))
+
+    async def prune(self) -> int:
+        """Delete finished jobs older than GEN_JOB_RETENTION_HOURS"""
+        cutoff = datetime.utcnow() - timedelta(hours=GEN_JOB_RETENTION_HOURS)
+        async with async_session() as db:
+            removed = (await db.execute(
+                delete(GenerationJob).where(
+                    GenerationJob.status.in_(("done", "failed")),
+                    GenerationJob.updated_at < cutoff,
+                )
+            )).rowcount or 0
+            await db.commit()
+        return removed
+
+
+generation_queue = GenerationQueue()
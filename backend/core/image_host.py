@@ -1,16 +1,162 @@
 """
 Cloudinary Image Host Module
-Handles image upload to Cloudinary for AI processing
+Handles image normalization and upload to Cloudinary for AI processing
 """
+import os
+import io
+import hmac
+import asyncio
+import multiprocessing
 import cloudinary
 import cloudinary.uploader
 import httpx
-import base64
-from typing import Dict, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Any, Optional, Tuple, Union
 import logging
 
+from core.http_client import get_http_client, operation_timeout, UPLOAD_TIMEOUT
+
 logger = logging.getLogger(__name__)
 
+# Normalization config from environment
+IMAGE_NORMALIZE_ENABLED = os.getenv("IMAGE_NORMALIZE_ENABLED", "true").lower() == "true"
+IMAGE_NORMALIZE_WORKERS = int(os.getenv("IMAGE_NORMALIZE_WORKERS", "2"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+# Frame size Sora renders for each AspectRatio (width, height)
+TARGET_FRAMES = {
+    "portrait": (720, 1280),
+    "landscape": (1280, 720),
+}
+
+# Bump when normalize_image output changes, so old dedupe entries aren't reused
+NORMALIZE_VERSION = 1
+
+
+# ── Normalization ─────────────────────────
+
+@dataclass(frozen=True)
+class NormalizedImage:
+    data: bytes
+    content_type: str
+    width: int
+    height: int
+
+
+def normalization_variant(aspect_ratio: Optional[str] = None) -> str:
+    """Identifies the normalized output for a given input (upload dedupe key part)"""
+    return f"n{NORMALIZE_VERSION}-{aspect_ratio or 'any'}-q{IMAGE_JPEG_QUALITY}"
+
+
+def target_scale(width: int, height: int, aspect_ratio: Optional[str] = None) -> float:
+    """
+    Scale that keeps the image just large enough to cover the video frame
+    Without an aspect ratio the image must cover both frames. Never upscales.
+    """
+    frames = [TARGET_FRAMES[aspect_ratio]] if aspect_ratio else list(TARGET_FRAMES.values())
+    needed = max(max(fw / width, fh / height) for fw, fh in frames)
+    return min(1.0, needed)
+
+
+def normalize_image(source: Union[bytes, str], aspect_ratio: Optional[str] = None, quality: int = IMAGE_JPEG_QUALITY) -> Tuple[bytes, int, int]:
+    """
+    Apply EXIF orientation, downscale for the video frame, drop metadata
+    and re-encode as progressive JPEG
+
+    CPU-bound; runs in the process pool (see normalize_for_upload).
+    `source` is the image bytes or a file path (read by the worker itself).
+
+    Returns:
+        (jpeg bytes, width, height)
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source if isinstance(source, str) else io.BytesIO(source)) as img:
+        # Only the first frame of animated GIF/WEBP is used
+        img.seek(0)
+
+        # Let the JPEG decoder downscale by a power of two while decoding
+        exif_transposed = img.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+        w, h = (img.height, img.width) if exif_transposed else img.size
+        scale = target_scale(w, h, aspect_ratio)
+        if img.format == "JPEG" and scale < 1.0:
+            draft_size = (int(img.width * scale) + 1, int(img.height * scale) + 1)
+            img.draft("RGB", draft_size)
+
+        img = ImageOps.exif_transpose(img)
+
+        if img.mode in ("RGBA", "LA", "P"):
+            # Flatten transparency onto white (JPEG has no alpha)
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        scale = target_scale(img.width, img.height, aspect_ratio)
+        if scale < 1.0:
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            img = img.resize(size, Image.Resampling.LANCZOS)
+
+        out = io.BytesIO()
+        # No exif/icc arguments: metadata (GPS, camera info) is dropped
+        img.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+        return out.getvalue(), img.width, img.height
+
+
+_image_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_image_pool() -> ProcessPoolExecutor:
+    """Process pool for image work (spawned lazily, outside the event loop)"""
+    global _image_pool
+    if _image_pool is None:
+        _image_pool = ProcessPoolExecutor(
+            max_workers=IMAGE_NORMALIZE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _image_pool
+
+
+def close_image_pool():
+    """Shut down the process pool (app shutdown)"""
+    global _image_pool
+    if _image_pool is not None:
+        _image_pool.shutdown(wait=False, cancel_futures=True)
+        _image_pool = None
+
+
+async def normalize_for_upload(source: Union[bytes, str], aspect_ratio: Optional[str] = None) -> Optional[NormalizedImage]:
+    """
+    Normalize an image in the process pool
+
+    Pass a file path for uploads: only the path is sent to the worker,
+    not a pickled copy of the image.
+
+    Returns:
+        NormalizedImage, or None if the image couldn't be processed
+        (callers then upload the original)
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        jpeg, width, height = await loop.run_in_executor(
+            get_image_pool(), normalize_image, source, aspect_ratio, IMAGE_JPEG_QUALITY
+        )
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM); start a fresh pool next time
+        logger.error("Image worker pool broke, recreating")
+        close_image_pool()
+        return None
+    except Exception as e:
+        logger.warning(f"Image normalization failed, uploading original: {e}")
+        return None
+    return NormalizedImage(data=jpeg, content_type="image/jpeg", width=width, height=height)
+
+
+# ── Cloudinary ─────────────────────────
 
 class ImageHost:
     """Cloudinary image upload handler"""
@@ -38,86 +184,33 @@ class ImageHost:
                 api_secret=api_secret
             )
     
-    async def upload_base64(self, image_base64: str, filename: Optional[str] = None) -> Dict[str, Any]:
+    async def upload_file(
+        self,
+        file_content: Union[bytes, BinaryIO],
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
-        Upload a base64-encoded image to Cloudinary
-        
-        Args:
-            image_base64: Base64-encoded image data (with or without data URI prefix)
-            filename: Optional public_id for the uploaded image
-            
-        Returns:
-            Dict with success, url, or error
+        Upload raw file bytes to Cloudinary (Unsigned)
+        Posts multipart directly over the shared HTTP client pool;
+        file objects are streamed in chunks rather than read whole
         """
         try:
-            # Strip data URI prefix if present
-            if "," in image_base64:
-                image_base64 = image_base64.split(",")[1]
-            
-            # Build upload URL
             upload_url = f"https://api.cloudinary.com/v1_1/{self.cloud_name}/image/upload"
-            
-            # Prepare form data
-            form_data = {
-                "file": f"data:image/jpeg;base64,{image_base64}",
-                "upload_preset": self.upload_preset
-            }
-            
+
+            form_data = {"upload_preset": self.upload_preset}
             if filename:
                 form_data["public_id"] = filename
-            
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(upload_url, data=form_data)
-                response.raise_for_status()
-                data = response.json()
-                
-                return {
-                    "success": True,
-                    "url": data.get("secure_url"),
-                    "public_id": data.get("public_id"),
-                    "width": data.get("width"),
-                    "height": data.get("height")
-                }
-                
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Cloudinary upload error: {e.response.status_code} - {e.response.text}")
-            return {
-                "success": False,
-                "error": f"Upload failed: {e.response.status_code}",
-                "detail": e.response.text
-            }
-        except Exception as e:
-            logger.error(f"Image upload failed: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e)
-            }
-    
-    async def upload_file(self, file_content: bytes, filename: Optional[str] = None) -> Dict[str, Any]:
-        """
-        Upload raw file bytes to Cloudinary using official SDK (Unsigned)
-        """
-        try:
-            import io
-            import asyncio
-            from functools import partial
 
-            # Prepare options
-            options = {
-                "upload_preset": self.upload_preset,
-                "cloud_name": self.cloud_name
-            }
-            if filename:
-                options["public_id"] = filename
-
-            # Run synchronous SDK method in thread pool
-            result = await asyncio.to_thread(
-                cloudinary.uploader.unsigned_upload,
-                io.BytesIO(file_content),
-                self.upload_preset,
-                cloud_name=self.cloud_name,
-                public_id=filename
+            client = get_http_client()
+            response = await client.post(
+                upload_url,
+                data=form_data,
+                files={"file": (filename or "upload", file_content, content_type)},
+                timeout=operation_timeout(UPLOAD_TIMEOUT)
             )
+            response.raise_for_status()
+            result = response.json()
             
             return {
                 "success": True,
@@ -127,6 +220,13 @@ class ImageHost:
                 "height": result.get("height")
             }
             
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Cloudinary upload error: {e.response.status_code} - {e.response.text}")
+            return {
+                "success": False,
+                "error": f"Upload failed: {e.response.status_code}",
+                "detail": e.response.text
+            }
         except Exception as e:
             logger.error(f"File upload failed: {str(e)}")
             return {
@@ -134,13 +234,15 @@ class ImageHost:
                 "error": str(e)
             }
     
-    def get_upload_signature(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    def get_upload_signature(self, params: Dict[str, Any], timestamp: Optional[int] = None) -> Dict[str, Any]:
         """
         Generate a signed upload signature for direct browser upload
         Only works if api_key and api_secret are configured
         
         Args:
             params: Upload parameters to sign
+            timestamp: Signature timestamp (default: now). Cloudinary accepts
+                signed requests for one hour after it.
             
         Returns:
             Dict with signature, timestamp, api_key
@@ -153,7 +255,8 @@ class ImageHost:
         
         try:
             import time
-            timestamp = int(time.time())
+            if timestamp is None:
+                timestamp = int(time.time())
             
             # Build params to sign
             params_to_sign = {**params, "timestamp": timestamp}
@@ -175,3 +278,15 @@ class ImageHost:
                 "success": False,
                 "error": str(e)
             }
+    
+    def verify_response_signature(self, public_id: str, version: Any, signature: str) -> bool:
+        """
+        Check the signature Cloudinary returns with an upload response,
+        proving the public_id/version really came from our account
+        """
+        if not self.api_secret or not public_id or not version or not signature:
+            return False
+        expected = cloudinary.utils.api_sign_request(
+            {"public_id": public_id, "version": version}, self.api_secret
+        )
+        return hmac.compare_digest(expected, signature)
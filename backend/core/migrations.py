@@ -0,0 +1,192 @@
+"""
+Schema Migrations Module
+Versioned, forward-only migrations applied at startup
+
+Each migration is a sync function; pending ones run in a single
+transaction and applied versions are recorded in `schema_migrations`.
+Migrations must be safe on databases created by older `create_all`
+calls, so they check for existing columns/indexes before adding them.
+"""
+import logging
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, ForeignKey, Integer, MetaData, String, Table, inspect, select, text
+)
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+_meta = MetaData()
+
+# Arbitrary constant identifying the migration advisory lock (PostgreSQL)
+MIGRATION_LOCK_KEY = 724_100_001
+
+schema_migrations = Table(
+    "schema_migrations",
+    _meta,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, default=datetime.utcnow),
+)
+
+
+def _index_names(conn: Connection, table: str) -> set:
+    return {ix["name"] for ix in inspect(conn).get_indexes(table)}
+
+
+def _create_index_if_missing(conn: Connection, table_name: str, index_name: str):
+    """Create an index declared on the model, unless it already exists"""
+    from core.database import Base
+
+    if index_name in _index_names(conn, table_name):
+        return
+    table = Base.metadata.tables[table_name]
+    index = next(ix for ix in table.indexes if ix.name == index_name)
+    index.create(conn)
+
+
+def _add_column_if_missing(conn: Connection, table_name: str, column_name: str):
+    """Add a nullable column declared on the model, unless it already exists"""
+    from core.database import Base
+
+    if column_name in {column["name"] for column in inspect(conn).get_columns(table_name)}:
+        return
+    column = Base.metadata.tables[table_name].c[column_name]
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+
+
+def _drop_index_if_exists(conn: Connection, table_name: str, index_name: str):
+    if index_name in _index_names(conn, table_name):
+        conn.execute(text(f"DROP INDEX {index_name}"))
+
+
+# ── Migrations ─────────────────────────
+
+# Frozen copy of the schema before versioned migrations. Migration 001 must
+# not follow the models: later tables and indexes belong to later migrations.
+_baseline_meta = MetaData()
+
+Table(
+    "users",
+    _baseline_meta,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("email", String, unique=True, nullable=False, index=True),
+    Column("name", String, nullable=False),
+    Column("avatar_url", String, nullable=True),
+    Column("role", String),
+    Column("is_approved", Boolean),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "user_api_keys",
+    _baseline_meta,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("user_id", Integer, ForeignKey("users.id"), unique=True, nullable=False),
+    Column("kie_api_key", String, nullable=True),
+    Column("updated_at", DateTime),
+)
+
+Table(
+    "video_tasks",
+    _baseline_meta,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False, index=True),
+    Column("kie_task_id", String, index=True),
+    Column("product_name", String, nullable=True),
+    Column("style", String, nullable=True),
+    Column("status", String),
+    Column("progress", Integer),
+    Column("video_url", String, nullable=True),
+    Column("thumbnail_url", String, nullable=True),
+    Column("error", String, nullable=True),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+)
+
+
+def _m001_initial_schema(conn: Connection):
+    """Tables as they existed before versioned migrations"""
+    _baseline_meta.create_all(conn, checkfirst=True)
+
+
+def _m002_video_task_indexes(conn: Connection):
+    """Composite/partial indexes for history, status and poller queries"""
+    _create_index_if_missing(conn, "video_tasks", "ix_video_tasks_user_created")
+    _create_index_if_missing(conn, "video_tasks", "ix_video_tasks_user_status")
+    _create_index_if_missing(conn, "video_tasks", "ix_video_tasks_active")
+    # Covered by the leading column of ix_video_tasks_user_created
+    _drop_index_if_exists(conn, "video_tasks", "ix_video_tasks_user_id")
+
+
+def _m003_uploaded_images(conn: Connection):
+    """Upload dedupe table (content hash -> Cloudinary URL)"""
+    from core.database import UploadedImage
+
+    UploadedImage.__table__.create(conn, checkfirst=True)
+
+
+def _m004_generation_jobs(conn: Connection):
+    """Durable queue for task creation"""
+    from core.database import GenerationJob
+
+    GenerationJob.__table__.create(conn, checkfirst=True)
+
+
+def _m005_task_list_versions(conn: Connection):
+    """Per-user task list version stamps (rows appear on first write)"""
+    from core.database import TaskListVersion
+
+    TaskListVersion.__table__.create(conn, checkfirst=True)
+
+
+def _m006_cache_versions(conn: Connection):
+    """Cross-worker cache invalidation counters (rows appear on first write)"""
+    from core.database import CacheVersion
+
+    CacheVersion.__table__.create(conn, checkfirst=True)
+
+
+def _m007_generation_job_sent_at(conn: Connection):
+    """Marks jobs whose createTask may have reached Kie.ai (never re-sent)"""
+    _add_column_if_missing(conn, "generation_jobs", "sent_at")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "initial_schema", _m001_initial_schema),
+    (2, "video_task_indexes", _m002_video_task_indexes),
+    (3, "uploaded_images", _m003_uploaded_images),
+    (4, "generation_jobs", _m004_generation_jobs),
+    (5, "task_list_versions", _m005_task_list_versions),
+    (6, "cache_versions", _m006_cache_versions),
+    (7, "generation_job_sent_at", _m007_generation_job_sent_at),
+]
+
+
+def run_migrations(conn: Connection) -> List[int]:
+    """
+    Apply all pending migrations in order
+
+    Returns:
+        List of versions applied by this call
+    """
+    # Several workers may start at once; serialize them on PostgreSQL
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+    _meta.create_all(conn, checkfirst=True)
+    applied = set(conn.execute(select(schema_migrations.c.version)).scalars().all())
+
+    newly_applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        logger.info(f"Applying migration {version:03d}_{name}")
+        migrate(conn)
+        conn.execute(schema_migrations.insert().values(version=version, name=name))
+        newly_applied.append(version)
+
+    return newly_applied
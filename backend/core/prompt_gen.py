@@ -2,11 +2,13 @@
 Prompt Generator Module
 Builds AI video generation prompts with spintax support
 """
-import re
 import random
+from functools import lru_cache
 from typing import Dict, Optional
 import logging
 
+from core.spintax import SpintaxTemplate
+
 logger = logging.getLogger(__name__)
 
 
@@ -69,39 +71,71 @@ PERSONAS = {
 }
 
 
-def process_spintax(text: str) -> str:
+# Video quality notes; one is appended to every prompt
+QUALITY_NOTES = [
+    "{Professional|High quality|Cinematic} video",
+    "{smooth|fluid|natural} camera movement",
+    "{excellent|perfect|great} lighting",
+    "{4K|HD|high resolution} quality"
+]
+
+# Filled per call; user input is inserted verbatim (never spun)
+PROMPT_VARIABLES = ("product_name", "highlight")
+
+
+@lru_cache(maxsize=256)
+def _compile_spintax(text: str) -> SpintaxTemplate:
+    return SpintaxTemplate.compile(text)
+
+
+def process_spintax(text: str, rng: Optional[random.Random] = None) -> str:
     """
     Process spintax in text, randomly selecting from options
     
     Example: "{Hello|Hi|Hey}" -> "Hi" (randomly selected)
+    Nesting to any depth is supported: "{Hi|Hello {there|friend}}"
     
     Args:
         text: Text containing spintax patterns
+        rng: Random source (default: the random module)
         
     Returns:
         Text with spintax resolved to random choices
     """
-    pattern = r'\{([^{}]+)\}'
-    
-    def replace_match(match):
-        options = match.group(1).split('|')
-        return random.choice(options)
-    
-    # Process nested spintax (up to 3 levels)
-    for _ in range(3):
-        new_text = re.sub(pattern, replace_match, text)
-        if new_text == text:
-            break
-        text = new_text
-    
-    return text
+    return _compile_spintax(text).render(rng)
+
+
+def _prompt_source(style: str, persona: str) -> str:
+    """Spintax source of the full prompt for a style/persona pair"""
+    style_template = STYLE_TEMPLATES.get(style, STYLE_TEMPLATES["showcase"])
+    persona_data = PERSONAS.get(persona, PERSONAS["product_only"])
+
+    parts = [
+        style_template["intro"].replace("{Person}", persona_data["person"] or "The camera"),
+        style_template["action"],
+        style_template["highlight"],
+    ]
+    # Setting (if person-based)
+    if persona_data["person"]:
+        parts.append(f"in {persona_data['setting']}")
+    parts.append(style_template["close"])
+
+    quality = "{" + "|".join(QUALITY_NOTES) + "}"
+    return ", ".join(parts) + f". {quality}."
+
+
+@lru_cache(maxsize=None)
+def compile_prompt(style: str, persona: str) -> SpintaxTemplate:
+    """Parse the prompt template for a style/persona pair (cached; done once per pair)"""
+    return SpintaxTemplate.compile(_prompt_source(style, persona), PROMPT_VARIABLES)
 
 
 def build_prompt(
     product_name: str,
     highlight: str,
     style: str,
-    persona: str
+    persona: str,
+    rng: Optional[random.Random] = None
 ) -> str:
     """
     Build a complete AI video generation prompt
@@ -111,72 +145,36 @@ def build_prompt(
         highlight: Key feature/benefit to emphasize
         style: One of: unboxing, review, tutorial, showcase, testimonial
         persona: One of: wanita_indo, pria_indo, hijabers, product_only
+        rng: Random source (default: the random module)
         
     Returns:
         Complete English prompt with spintax processed
     """
-    # Get templates
-    style_template = STYLE_TEMPLATES.get(style, STYLE_TEMPLATES["showcase"])
-    persona_data = PERSONAS.get(persona, PERSONAS["product_only"])
-    
-    # Build person description
-    if persona_data["person"]:
-        person_desc = persona_data["person"]
-    else:
-        person_desc = ""
-    
-    # Build the prompt parts
-    parts = []
-    
-    # Intro
-    intro = style_template["intro"]
-    if "{Person}" in intro:
-        if person_desc:
-            intro = intro.replace("{Person}", person_desc)
-        else:
-            intro = intro.replace("{Person}", "The camera")
-    intro = intro.replace("{product_name}", product_name)
-    parts.append(intro)
-    
-    # Action
-    action = style_template["action"]
-    action = action.replace("{product_name}", product_name)
-    parts.append(action)
-    
-    # Highlight
-    hl = style_template["highlight"]
-    hl = hl.replace("{highlight}", highlight)
-    parts.append(hl)
-    
-    # Setting (if person-based)
-    if persona_data["person"]:
-        setting = f"in {persona_data['setting']}"
-        parts.append(setting)
-    
-    # Close
-    close = style_template["close"]
-    parts.append(close)
-    
-    # Combine and add style notes
-    prompt = ", ".join(parts) + "."
-    
-    # Add video quality instructions
-    quality_notes = [
-        "{Professional|High quality|Cinematic} video",
-        "{smooth|fluid|natural} camera movement",
-        "{excellent|perfect|great} lighting",
-        "{4K|HD|high resolution} quality"
-    ]
-    
-    prompt += f" {random.choice(quality_notes)}."
-    
-    # Process all spintax
-    final_prompt = process_spintax(prompt)
-    
-    # Clean up multiple spaces
-    final_prompt = re.sub(r'\s+', ' ', final_prompt).strip()
-    
-    return final_prompt
+    return compile_prompt(style, persona).render(rng, **_prompt_values(product_name, highlight)).strip()
+
+
+def _prompt_values(product_name: str, highlight: str) -> Dict[str, str]:
+    # Templates never contain runs of whitespace; only user input can
+    return {
+        "product_name": " ".join(product_name.split()),
+        "highlight": " ".join(highlight.split()),
+    }
+
+
+class PromptSpaceExceeded(ValueError):
+    """More unique prompts requested than a style/persona pair can produce"""
+
+    def __init__(self, requested: int, available: int):
+        self.requested = requested
+        self.available = available
+        super().__init__(
+            f"Requested {requested} unique prompts but this style/persona only has {available} variations"
+        )
+
+
+def prompt_space_size(style: str, persona: str) -> int:
+    """Number of distinct prompts a style/persona pair can produce"""
+    return compile_prompt(style, persona).size
 
 
 def generate_batch_prompts(
@@ -184,41 +182,35 @@ def generate_batch_prompts(
     highlight: str,
     style: str,
     persona: str,
-    count: int = 1
+    count: int = 1,
+    rng: Optional[random.Random] = None
 ) -> list:
     """
     Generate multiple unique prompts for batch processing
     
+    Variants are drawn without replacement from the numbered variant space,
+    so uniqueness is guaranteed and costs O(count).
+    
     Args:
         product_name: Name of the product
         highlight: Key feature/benefit
         style: Video style
         persona: Model persona
         count: Number of prompts to generate
+        rng: Random source (default: the random module)
         
     Returns:
         List of unique prompts
-    """
-    prompts = []
-    seen = set()
-    max_attempts = count * 10
-    attempts = 0
-    
-    while len(prompts) < count and attempts < max_attempts:
-        prompt = build_prompt(product_name, highlight, style, persona)
         
-        # Avoid duplicates
-        if prompt not in seen:
-            prompts.append(prompt)
-            seen.add(prompt)
-        
-        attempts += 1
-    
-    # If we couldn't get enough unique prompts, just duplicate the last one
-    while len(prompts) < count:
-        prompts.append(prompts[-1] if prompts else build_prompt(product_name, highlight, style, persona))
-    
-    return prompts
+    Raises:
+        PromptSpaceExceeded: count is larger than prompt_space_size(style, persona)
+    """
+    template = compile_prompt(style, persona)
+    if count > template.size:
+        raise PromptSpaceExceeded(count, template.size)
+
+    prompts = template.sample(count, rng, **_prompt_values(product_name, highlight))
+    return [prompt.strip() for prompt in prompts]
 
 
 # Test function
@@ -0,0 +1,168 @@
+"""
+Rate Limit Module
+Per-API-key token buckets for upstream Kie.ai calls
+
+Kie.ai rate-limits each account key. Every KieApiClient call takes a token
+from the bucket for its (key, kind) first, where kind is "create", "status"
+or "credit", so a burst of batch creation can't starve status sync and
+vice versa. Callers over budget wait instead of failing.
+
+Buckets use GCRA (a token bucket expressed as reservations): each call
+reserves the next free slot, so waiters are served strictly in arrival
+order. Limits apply per process; with several workers/replicas on one
+key, divide the rates accordingly.
+"""
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Budgets from environment (per key per process). Kie.ai allows about 20 new
+# generation requests per 10s per account: a burst of 10 refilled at 1/s
+# never exceeds that in any 10s window.
+KIE_CREATE_RATE = float(os.getenv("KIE_CREATE_RATE", "1"))
+KIE_CREATE_BURST = int(os.getenv("KIE_CREATE_BURST", "10"))
+KIE_STATUS_RATE = float(os.getenv("KIE_STATUS_RATE", "5"))
+KIE_STATUS_BURST = int(os.getenv("KIE_STATUS_BURST", "10"))
+KIE_CREDIT_RATE = float(os.getenv("KIE_CREDIT_RATE", "1"))
+KIE_CREDIT_BURST = int(os.getenv("KIE_CREDIT_BURST", "3"))
+
+# (rate per second, burst) per kind of call
+KIE_RATE_LIMITS: Dict[str, Tuple[float, int]] = {
+    "create": (KIE_CREATE_RATE, KIE_CREATE_BURST),
+    "status": (KIE_STATUS_RATE, KIE_STATUS_BURST),
+    "credit": (KIE_CREDIT_RATE, KIE_CREDIT_BURST),
+}
+
+# Idle buckets are full again; drop them once there are this many
+_MAX_IDLE_BUCKETS = 1000
+
+
+class TokenBucket:
+    """GCRA bucket: `burst` tokens, refilled at `rate` per second"""
+    __slots__ = ("rate", "burst", "_interval", "_tat")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        # Theoretical arrival time: when the bucket will be full again
+        self._tat = 0.0
+
+    def reserve(self, now: float) -> float:
+        """Take the next slot; returns seconds to wait before using it"""
+        if not self._interval:
+            return 0.0
+        tat = max(self._tat, now)
+        delay = max(tat - (self.burst - 1) * self._interval - now, 0.0)
+        self._tat = tat + self._interval
+        return delay
+
+    def refund(self):
+        """Give back a reserved slot that was not used"""
+        self._tat -= self._interval
+
+    def pause(self, now: float, seconds: float):
+        """Empty the bucket and hold new calls for `seconds` (upstream said 429)"""
+        if not self._interval:
+            return
+        self._tat = max(self._tat, now + seconds + (self.burst - 1) * self._interval)
+
+    def available(self, now: float) -> int:
+        """Whole tokens that could be taken right now without waiting"""
+        if not self._interval:
+            return self.burst
+        backlog = (max(self._tat, now) - now) * self.rate
+        return max(int(self.burst - backlog + 1e-9), 0)
+
+    def idle(self, now: float) -> bool:
+        return self._tat <= now
+
+
+@dataclass
+class RateLimitStats:
+    """Wait-time counters for one kind of call (all keys)"""
+    acquired: int = 0
+    delayed: int = 0
+    waiting: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "acquired": self.acquired,
+            "delayed": self.delayed,
+            "waiting": self.waiting,
+            "total_wait_seconds": round(self.total_wait, 3),
+            "avg_wait_seconds": round(self.total_wait / self.acquired, 3) if self.acquired else 0.0,
+            "max_wait_seconds": round(self.max_wait, 3),
+        }
+
+
+class KieRateLimiter:
+    """Token buckets keyed by (API key fingerprint, kind of call)"""
+
+    def __init__(self, limits: Dict[str, Tuple[float, int]] = KIE_RATE_LIMITS):
+        self.limits = limits
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.stats: Dict[str, RateLimitStats] = {kind: RateLimitStats() for kind in limits}
+
+    def _bucket(self, key_id: str, kind: str) -> TokenBucket:
+        bucket = self._buckets.get((key_id, kind))
+        if bucket is None:
+            if len(self._buckets) >= _MAX_IDLE_BUCKETS:
+                self._prune(time.monotonic())
+            rate, burst = self.limits[kind]
+            bucket = self._buckets[(key_id, kind)] = TokenBucket(rate, burst)
+        return bucket
+
+    def _prune(self, now: float):
+        for bucket_key in [k for k, b in self._buckets.items() if b.idle(now)]:
+            del self._buckets[bucket_key]
+
+    async def acquire(self, key_id: str, kind: str) -> float:
+        """
+        Wait for a token (first come, first served)
+
+        Returns:
+            Seconds spent waiting
+        """
+        bucket = self._bucket(key_id, kind)
+        stats = self.stats[kind]
+        delay = bucket.reserve(time.monotonic())
+        if delay > 0:
+            stats.waiting += 1
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                bucket.refund()
+                raise
+            finally:
+                stats.waiting -= 1
+            stats.delayed += 1
+            stats.total_wait += delay
+            stats.max_wait = max(stats.max_wait, delay)
+            if delay >= 1:
+                logger.info(f"Kie.ai {kind} call for key {key_id} waited {delay:.1f}s for rate limit")
+        stats.acquired += 1
+        return delay
+
+    def pause(self, key_id: str, kind: str, seconds: float):
+        """Back off a key after Kie.ai rate-limited it anyway (e.g. other clients on the same key)"""
+        logger.warning(f"Kie.ai rate-limited {kind} calls for key {key_id}; pausing {seconds:.1f}s")
+        self._bucket(key_id, kind).pause(time.monotonic(), seconds)
+
+    def available(self, key_id: str, kind: str) -> int:
+        """Calls of this kind the key can make now without waiting"""
+        return self._bucket(key_id, kind).available(time.monotonic())
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Wait-time metrics per kind of call"""
+        return {kind: stats.as_dict() for kind, stats in self.stats.items()}
+
+
+kie_rate_limiter = KieRateLimiter()
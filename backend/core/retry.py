@@ -0,0 +1,254 @@
+"""
+Retry Module
+Error classification, jittered retries and circuit breakers for Kie.ai calls
+
+Failures are split into transient (timeouts, connection errors, 429, 5xx,
+and the same codes in Kie.ai's JSON envelope) and permanent (other 4xx,
+bad requests, unknown tasks). Transient failures are retried with
+full-jitter exponential backoff, honouring Retry-After. Each endpoint has
+a circuit breaker: after KIE_BREAKER_THRESHOLD consecutive transient
+failures it opens and calls fail fast for KIE_BREAKER_COOLDOWN seconds,
+then one trial call decides whether it closes again.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Retry/breaker config from environment
+KIE_RETRY_ATTEMPTS = int(os.getenv("KIE_RETRY_ATTEMPTS", "3"))
+KIE_RETRY_BASE = float(os.getenv("KIE_RETRY_BASE", "0.5"))
+KIE_RETRY_MAX = float(os.getenv("KIE_RETRY_MAX", "10"))
+# Retry-After longer than this is not waited out in-request (the caller retries later)
+KIE_RETRY_AFTER_MAX = float(os.getenv("KIE_RETRY_AFTER_MAX", "30"))
+KIE_BREAKER_THRESHOLD = int(os.getenv("KIE_BREAKER_THRESHOLD", "5"))
+KIE_BREAKER_COOLDOWN = float(os.getenv("KIE_BREAKER_COOLDOWN", "30"))
+
+# HTTP (or Kie.ai envelope) codes worth repeating; 455 is Kie.ai "service unavailable"
+TRANSIENT_STATUS_CODES = {408, 425, 429, 455, 500, 502, 503, 504}
+
+# Errors raised before the request reached Kie.ai: safe to repeat even for createTask
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Codes with which Kie.ai turns a request away without acting on it
+REFUSED_STATUS_CODES = {429, 503}
+
+
+class UpstreamError(Exception):
+    """A failed Kie.ai call, classified"""
+
+    def __init__(
+        self,
+        message: str,
+        transient: bool,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        not_sent: bool = False
+    ):
+        super().__init__(message)
+        self.transient = transient
+        self.status_code = status_code
+        self.retry_after = retry_after
+        # True when Kie.ai never saw the request (repeating can't duplicate work)
+        self.not_sent = not_sent
+
+
+class CircuitOpen(UpstreamError):
+    """Endpoint is failing; call skipped without contacting Kie.ai"""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(
+            f"Kie.ai {endpoint} temporarily unavailable, retrying in {retry_in:.0f}s",
+            transient=True,
+            retry_after=retry_in,
+            not_sent=True
+        )
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header (delta-seconds or HTTP date) as seconds from now"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exc: Exception) -> UpstreamError:
+    """Map an exception from an httpx call to an UpstreamError"""
+    if isinstance(exc, UpstreamError):
+        return exc
+    if isinstance(exc, httpx.HTTPStatusError):
+        response = exc.response
+        detail = response.text[:200] if response.text else "No details"
+        return UpstreamError(
+            f"Kie.ai API Error ({response.status_code}): {detail}",
+            transient=response.status_code in TRANSIENT_STATUS_CODES,
+            status_code=response.status_code,
+            retry_after=parse_retry_after(response.headers.get("Retry-After"))
+        )
+    if isinstance(exc, httpx.TransportError):
+        return UpstreamError(
+            f"Kie.ai unreachable: {exc.__class__.__name__}: {exc}",
+            transient=True,
+            not_sent=isinstance(exc, _NOT_SENT_ERRORS)
+        )
+    # Unparseable body and the like: the next response may well be fine
+    return UpstreamError(str(exc) or exc.__class__.__name__, transient=True)
+
+
+def safe_to_repeat(error: UpstreamError) -> bool:
+    """
+    A transient failure Kie.ai surely didn't act on: never sent, or refused
+    with 429/503. Only these may repeat a non-idempotent call (createTask).
+    """
+    return error.transient and (error.not_sent or error.status_code in REFUSED_STATUS_CODES)
+
+
+def check_envelope(data: Any):
+    """
+    Kie.ai answers HTTP 200 with {"code": ..., "msg": ...}; raise for
+    error codes inside the envelope like for HTTP ones
+    """
+    if not data or not isinstance(data, dict):
+        raise UpstreamError("Empty or invalid response from Kie.ai", transient=True)
+    code = data.get("code")
+    if isinstance(code, int) and code != 200:
+        raise UpstreamError(
+            f"Kie.ai API Error ({code}): {str(data.get('msg') or '')[:200]}",
+            transient=code in TRANSIENT_STATUS_CODES,
+            status_code=code
+        )
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)"""
+    return random.uniform(0, min(KIE_RETRY_BASE * (2 ** (attempt - 1)), KIE_RETRY_MAX))
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one endpoint (closed -> open -> half-open)"""
+
+    def __init__(self, name: str, threshold: int = KIE_BREAKER_THRESHOLD, cooldown: float = KIE_BREAKER_COOLDOWN):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go out now"""
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half-open" and not self._trial_running:
+            self._trial_running = True
+            return
+        retry_in = max(self.cooldown - (time.monotonic() - self.opened_at), 1.0)
+        raise CircuitOpen(self.name, retry_in)
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"Kie.ai {self.name} circuit closed")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        reopen = self._trial_running
+        self._trial_running = False
+        if reopen or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+            logger.warning(f"Kie.ai {self.name} circuit open for {self.cooldown:.0f}s after {self.failures} failures")
+
+    def release(self):
+        """A call ended without telling us anything about the endpoint's health"""
+        self._trial_running = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+# One breaker per Kie.ai endpoint, shared by all keys (outages are not per key)
+kie_breakers: Dict[str, CircuitBreaker] = {
+    kind: CircuitBreaker(kind) for kind in ("create", "status", "credit")
+}
+
+
+async def call_with_retry(
+    endpoint: str,
+    send: Callable[[], Awaitable[Any]],
+    idempotent: bool = True,
+    on_rate_limited: Optional[Callable[[float], None]] = None,
+    attempts: int = KIE_RETRY_ATTEMPTS
+) -> Any:
+    """
+    Run `send` (one upstream call) with breaker checks and bounded retries
+
+    Non-idempotent calls (createTask) are only repeated when Kie.ai surely
+    didn't act on them: the request was never sent, or it was refused with
+    429/503. On 429, `on_rate_limited` is told how long to back off and is
+    expected to hold the retry back (see KieRateLimiter.pause).
+
+    Raises:
+        UpstreamError: the last failure (CircuitOpen when skipped)
+    """
+    breaker = kie_breakers[endpoint]
+    attempt = 0
+    while True:
+        attempt += 1
+        breaker.before_call()
+        try:
+            result = await send()
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            error = classify_error(e)
+            # Rate limiting is about our key, not the endpoint's health
+            if error.status_code == 429:
+                breaker.release()
+            elif error.transient:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+            delay = error.retry_after if error.retry_after is not None else backoff_delay(attempt)
+            rate_limited = error.status_code == 429 and on_rate_limited is not None
+            if rate_limited:
+                # The key's bucket now holds this (and every other) call back
+                on_rate_limited(delay)
+
+            repeatable = (error.transient and idempotent) or safe_to_repeat(error)
+            if not repeatable or attempt >= attempts or delay > KIE_RETRY_AFTER_MAX:
+                raise error
+            if rate_limited:
+                delay = 0
+            logger.info(f"Kie.ai {endpoint} attempt {attempt} failed ({error}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        breaker.record_success()
+        return result
@@ -0,0 +1,217 @@
+"""
+Spintax Module
+Compiles spintax templates ("{Hi|Hello {there|friend}}") into a tree once,
+then renders them in a single pass
+
+Tree shape (kept as plain tuples/strings so rendering is cheap):
+    Sequence = tuple of nodes, rendered in order
+    node     = str      literal text
+             | Choice   tuple of Sequences, one picked per render
+             | Var      placeholder name, filled from render() values
+
+Groups may nest to any depth. A group with a single option is just its
+content ("{x}" -> "x"), except "{name}" where name is a declared variable.
+Unbalanced braces are kept as literal text.
+"""
+import random
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+_TOKEN = re.compile(r"([{|}])")
+
+
+class Choice(tuple):
+    """Alternatives: a tuple of Sequences"""
+    __slots__ = ()
+
+
+class Var(str):
+    """Placeholder resolved at render time"""
+    __slots__ = ()
+
+
+Node = Union[str, Choice, Var]
+Sequence = Tuple[Node, ...]
+
+
+def _merge_text(items: List[Node]) -> Sequence:
+    """Join adjacent literal strings so rendering appends fewer pieces"""
+    merged: List[Node] = []
+    for item in items:
+        if type(item) is str:
+            if not item:
+                continue
+            if merged and type(merged[-1]) is str:
+                merged[-1] += item
+                continue
+        merged.append(item)
+    return tuple(merged)
+
+
+def parse(text: str, variables: Iterable[str] = ()) -> Sequence:
+    """Parse spintax text into a Sequence"""
+    variables = frozenset(variables)
+    # Each frame is the list of options of an open group; root has one option
+    frames: List[List[List[Node]]] = [[[]]]
+
+    for token in _TOKEN.split(text):
+        if token == "{":
+            frames.append([[]])
+        elif token == "|" and len(frames) > 1:
+            frames[-1].append([])
+        elif token == "}" and len(frames) > 1:
+            options = frames.pop()
+            target = frames[-1][-1]
+            if len(options) == 1:
+                content = options[0]
+                if len(content) == 1 and type(content[0]) is str and content[0] in variables:
+                    target.append(Var(content[0]))
+                else:
+                    target.extend(content)
+            else:
+                target.append(Choice(_merge_text(option) for option in options))
+        elif token:
+            frames[-1][-1].append(token)
+
+    # Unclosed groups: put the braces and separators back as text
+    while len(frames) > 1:
+        options = frames.pop()
+        target = frames[-1][-1]
+        target.append("{")
+        for i, option in enumerate(options):
+            if i:
+                target.append("|")
+            target.extend(option)
+
+    return _merge_text(frames[0][0])
+
+
+def render_sequence(
+    sequence: Sequence,
+    rng: random.Random,
+    values: Dict[str, str],
+    out: List[str]
+):
+    """Append one random rendering of `sequence` to `out`"""
+    for node in sequence:
+        node_type = type(node)
+        if node_type is str:
+            out.append(node)
+        elif node_type is Choice:
+            render_sequence(node[int(rng.random() * len(node))], rng, values, out)
+        else:
+            out.append(values[node])
+
+
+def _measure(sequence: Sequence, sizes: Dict[int, int]) -> int:
+    """Number of distinct choice paths through `sequence`; fills `sizes` by id()"""
+    total = 1
+    for node in sequence:
+        if type(node) is Choice:
+            size = sum(_measure(option, sizes) for option in node)
+            sizes[id(node)] = size
+            total *= size
+    sizes[id(sequence)] = total
+    return total
+
+
+def decode_sequence(
+    sequence: Sequence,
+    index: int,
+    sizes: Dict[int, int],
+    values: Dict[str, str],
+    out: List[str]
+):
+    """
+    Append the variant numbered `index` (0 <= index < size) to `out`,
+    piece by piece in REVERSE order (callers reverse once at the end)
+
+    The index is read as a mixed-radix number over the sequence's choices
+    (last choice least significant); within a choice, options own
+    consecutive index ranges.
+    """
+    for node in reversed(sequence):
+        node_type = type(node)
+        if node_type is str:
+            out.append(node)
+        elif node_type is Choice:
+            index, digit = divmod(index, sizes[id(node)])
+            for option in node:
+                option_size = sizes[id(option)]
+                if digit < option_size:
+                    decode_sequence(option, digit, sizes, values, out)
+                    break
+                digit -= option_size
+        else:
+            out.append(values[node])
+
+
+class SpintaxTemplate:
+    """
+    A parsed template; render() is a single pass over the tree
+
+    Every choice path is numbered, so variants can also be enumerated
+    (variant(i) for 0 <= i < size) or sampled without replacement.
+    """
+    __slots__ = ("tree", "variables", "size", "_sizes")
+
+    def __init__(self, tree: Sequence, variables: FrozenSet[str] = frozenset()):
+        self.tree = tree
+        self.variables = variables
+        self._sizes: Dict[int, int] = {}
+        self.size = _measure(tree, self._sizes)
+
+    @classmethod
+    def compile(cls, text: str, variables: Iterable[str] = ()) -> "SpintaxTemplate":
+        variables = frozenset(variables)
+        return cls(parse(text, variables), variables)
+
+    def render(self, rng: Optional[random.Random] = None, **values: str) -> str:
+        """
+        Render with random choices from `rng` (default: the `random` module)
+        Variable values are inserted verbatim (never spun).
+        """
+        out: List[str] = []
+        render_sequence(self.tree, rng or random, values, out)
+        return "".join(out)
+
+    def variant(self, index: int, **values: str) -> str:
+        """Render the variant numbered `index` (0 <= index < size)"""
+        if not 0 <= index < self.size:
+            raise IndexError(f"variant {index} out of range (template has {self.size})")
+        out: List[str] = []
+        decode_sequence(self.tree, index, self._sizes, values, out)
+        return "".join(reversed(out))
+
+    def sample(self, count: int, rng: Optional[random.Random] = None, **values: str) -> List[str]:
+        """
+        `count` distinct renderings, drawn uniformly without replacement
+
+        Raises:
+            ValueError: count is larger than the template's variant space
+        """
+        if count > self.size:
+            raise ValueError(f"Requested {count} variants but template has only {self.size}")
+        rng = rng or random
+        results: List[str] = []
+        seen = set()
+        indices = rng.sample(range(self.size), count)
+        used = set(indices)
+        for index in indices:
+            text = self.variant(index, **values)
+            if text not in seen:
+                seen.add(text)
+                results.append(text)
+
+        # Distinct indices are distinct choice paths; texts only collide if a
+        # template offers the same wording twice, so top up in that case
+        while len(results) < count and len(used) < self.size:
+            index = rng.randrange(self.size)
+            if index in used:
+                continue
+            used.add(index)
+            text = self.variant(index, **values)
+            if text not in seen:
+                seen.add(text)
+                results.append(text)
+        return results
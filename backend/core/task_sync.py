@@ -0,0 +1,322 @@
+"""
+Task Sync Module
+Background poller that keeps VideoTask rows in sync with Kie.ai
+"""
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import select, update, text
+
+from core.callbacks import callbacks_enabled
+from core.database import async_session, engine, is_sqlite, ACTIVE_TASK_FILTER, VideoTask
+from core.events import task_events, task_delta
+from core.rate_limit import kie_rate_limiter
+from core.task_versions import bump_task_versions
+from core.user_keys import get_kie_clients
+
+logger = logging.getLogger(__name__)
+
+# Statuses that still change upstream
+ACTIVE_STATUSES = ["pending", "queued", "processing"]
+TERMINAL_STATUSES = ["completed", "failed"]
+
+# Poller config from environment
+TASK_POLLER_ENABLED = os.getenv("TASK_POLLER_ENABLED", "true").lower() in ("1", "true", "yes")
+TASK_POLL_TICK = float(os.getenv("TASK_POLL_TICK", "2"))
+TASK_POLL_MIN_DELAY = float(os.getenv("TASK_POLL_MIN_DELAY", "5"))
+TASK_POLL_MAX_DELAY = float(os.getenv("TASK_POLL_MAX_DELAY", "120"))
+TASK_POLL_AGE_STEP = float(os.getenv("TASK_POLL_AGE_STEP", "300"))
+TASK_POLL_CONCURRENCY = int(os.getenv("TASK_POLL_CONCURRENCY", "10"))
+# With Kie.ai callbacks on, polling only catches missed callbacks
+TASK_POLL_FALLBACK_DELAY = float(os.getenv("TASK_POLL_FALLBACK_DELAY", "300"))
+
+# Columns written by status sync
+_SYNCED_FIELDS = ("status", "progress", "video_url", "thumbnail_url", "error")
+
+# Arbitrary constant identifying the poller leader lock (PostgreSQL)
+POLLER_LOCK_KEY = 724_100_002
+
+# Base delay per Kie state: generating tasks move fastest, queued ones sit still
+_BASE_DELAY = {
+    "processing": 1.0,
+    "queued": 2.0,
+    "pending": 2.0,
+}
+
+
+def next_poll_delay(status: str, age_seconds: float) -> float:
+    """
+    Seconds to wait before polling a task again
+
+    Starts from a per-state base and doubles every TASK_POLL_AGE_STEP
+    seconds of task age, so long-running tasks are checked less often.
+    When callbacks are enabled, this is a slow fallback instead.
+    """
+    if callbacks_enabled():
+        return TASK_POLL_FALLBACK_DELAY
+    factor = _BASE_DELAY.get(status, 2.0) * (2 ** int(max(age_seconds, 0) // TASK_POLL_AGE_STEP))
+    return min(TASK_POLL_MIN_DELAY * factor, TASK_POLL_MAX_DELAY)
+
+
+def status_changes(task: VideoTask, status_res: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fields of a VideoTask row that a Kie.ai status result would change
+
+    Idempotent: replaying the same result yields no changes, and a finished
+    task is never changed again by a late or duplicate update. A failed
+    status check (success=False) changes nothing either.
+    """
+    if task.status in TERMINAL_STATUSES or not status_res.get("success", True):
+        return {}
+
+    # A result without a status (e.g. a progress-only callback) keeps the current one
+    updates = {
+        field: status_res[field] for field in ("status", "progress") if field in status_res
+    }
+    for field in ("video_url", "thumbnail_url", "error"):
+        if status_res.get(field):
+            updates[field] = status_res.get(field)
+
+    return {field: value for field, value in updates.items() if getattr(task, field) != value}
+
+
+def apply_status_update(task: VideoTask, status_res: Dict[str, Any]) -> bool:
+    """
+    Copy a Kie.ai status result onto a VideoTask row
+
+    Returns:
+        True if any field changed
+    """
+    changes = status_changes(task, status_res)
+    for field, value in changes.items():
+        setattr(task, field, value)
+    return bool(changes)
+
+
+async def bulk_update_tasks(db, tasks: List[VideoTask], changes: List[Dict[str, Any]]):
+    """
+    Write status changes for many tasks in one executemany UPDATE by primary key
+
+    Every parameter set carries the same columns so the batch stays a single
+    statement on both SQLite and PostgreSQL.
+    """
+    if not tasks:
+        return
+    utc_now = datetime.utcnow()
+    rows = []
+    for task, task_changes in zip(tasks, changes):
+        row = {field: getattr(task, field) for field in _SYNCED_FIELDS}
+        row.update(task_changes)
+        row["id"] = task.id
+        row["updated_at"] = utc_now
+        rows.append(row)
+    await db.execute(update(VideoTask), rows)
+
+
+async def refresh_tasks(db, client, tasks: List[VideoTask], deadline: float) -> Tuple[List[VideoTask], int]:
+    """
+    Check tasks upstream concurrently and apply what arrives within `deadline`
+    seconds; unanswered checks are cancelled and their rows left as they are
+
+    Returns:
+        (tasks that changed, number of checks that timed out)
+    """
+    if not tasks:
+        return [], 0
+    # End the read transaction so no pooled connection (or SQLite lock) is
+    # held while waiting on Kie.ai; the rows stay loaded (expire_on_commit=False)
+    await db.commit()
+    checks = {
+        asyncio.ensure_future(client.get_task_status(task.kie_task_id)): task
+        for task in tasks
+    }
+    done, not_done = await asyncio.wait(checks, timeout=deadline)
+    for check in not_done:
+        check.cancel()
+    # Let cancelled checks unwind (returns their rate-limit slots)
+    await asyncio.gather(*not_done, return_exceptions=True)
+
+    changed = []
+    for check in done:
+        if check.exception() is not None:
+            logger.error(f"Error refreshing task {checks[check].kie_task_id}: {check.exception()}")
+            continue
+        if apply_status_update(checks[check], check.result()):
+            changed.append(checks[check])
+
+    if changed:
+        await bump_task_versions(db, {task.user_id for task in changed})
+        await db.commit()
+        for task in changed:
+            task_events.publish_task(task)
+    return changed, len(not_done)
+
+
+class TaskPoller:
+    """Polls active tasks with per-task adaptive backoff"""
+
+    def __init__(self):
+        self._next_check: Dict[int, float] = {}
+        self._runner: Optional[asyncio.Task] = None
+        self._lock_conn = None
+
+    async def start(self):
+        """Start the background loop (called from the app lifespan)"""
+        if not TASK_POLLER_ENABLED:
+            logger.info("Task poller disabled")
+            return
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+            logger.info("Task poller started")
+
+    async def stop(self):
+        """Stop the background loop"""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        await self._release_leadership()
+
+    async def _is_leader(self) -> bool:
+        """
+        Only one poller runs across all workers/replicas sharing a PostgreSQL
+        database, elected with a session-level advisory lock. SQLite
+        deployments are single-host; use TASK_POLLER_ENABLED there instead.
+        """
+        if is_sqlite():
+            return True
+        try:
+            if self._lock_conn is not None:
+                # Still holding the lock as long as the session is alive
+                await self._lock_conn.execute(text("SELECT 1"))
+                return True
+            conn = await engine.connect()
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            acquired = (await conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": POLLER_LOCK_KEY}
+            )).scalar()
+            if acquired:
+                self._lock_conn = conn
+                logger.info("Task poller acquired leadership")
+                return True
+            await conn.close()
+            return False
+        except Exception as e:
+            logger.error(f"Task poller leadership check failed: {e}")
+            await self._release_leadership()
+            return False
+
+    async def _release_leadership(self):
+        if self._lock_conn is not None:
+            try:
+                await self._lock_conn.close()
+            except Exception:
+                pass
+            self._lock_conn = None
+
+    async def _run(self):
+        while True:
+            try:
+                if await self._is_leader():
+                    await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Task poll cycle failed: {e}")
+            await asyncio.sleep(TASK_POLL_TICK)
+
+    async def poll_once(self) -> int:
+        """
+        Poll every active task that is due
+
+        Returns:
+            Number of tasks checked upstream
+        """
+        now = time.monotonic()
+
+        # Short read session: nothing is held open during the upstream calls
+        async with async_session() as db:
+            result = await db.execute(
+                select(VideoTask).where(ACTIVE_TASK_FILTER)
+            )
+            active_tasks = result.scalars().all()
+
+            # Forget backoff state of tasks that are no longer active
+            active_ids = {t.id for t in active_tasks}
+            for task_id in list(self._next_check):
+                if task_id not in active_ids:
+                    del self._next_check[task_id]
+
+            due = [t for t in active_tasks if self._next_check.get(t.id, 0) <= now and t.kie_task_id]
+            if not due:
+                return 0
+
+            # One client per user, from the decrypted key cache
+            clients = await get_kie_clients(db, (t.user_id for t in due))
+
+        semaphore = asyncio.Semaphore(TASK_POLL_CONCURRENCY)
+
+        async def check(task: VideoTask) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    return await clients[task.user_id].get_task_status(task.kie_task_id)
+                except Exception as e:
+                    logger.error(f"Error syncing task {task.kie_task_id}: {e}")
+                    return None
+
+        # Only what each key's status budget allows right now; the rest
+        # stay due for the next tick, so one busy key can't stall the cycle
+        checked: List[VideoTask] = []
+        budgets = {
+            user_id: kie_rate_limiter.available(client.key_id, "status")
+            for user_id, client in clients.items()
+        }
+        for task in due:
+            if budgets.get(task.user_id, 0) > 0:
+                budgets[task.user_id] -= 1
+                checked.append(task)
+        results = await asyncio.gather(*(check(t) for t in checked))
+
+        utc_now = datetime.utcnow()
+        changed: List[VideoTask] = []
+        changes: List[Dict[str, Any]] = []
+        for task, status_res in zip(checked, results):
+            # A failed check keeps the last known state in the DB
+            checked_ok = status_res is not None and status_res.get("success")
+            task_changes = status_changes(task, status_res) if checked_ok else {}
+            if task_changes:
+                changed.append(task)
+                changes.append(task_changes)
+            new_status = task_changes.get("status", task.status)
+            age = (utc_now - task.created_at).total_seconds() if task.created_at else 0
+            if checked_ok or (status_res or {}).get("transient", True):
+                self._next_check[task.id] = now + next_poll_delay(new_status, age)
+            else:
+                # Permanent error (unknown task, rejected key): check rarely
+                self._next_check[task.id] = now + TASK_POLL_MAX_DELAY
+
+        # Users without a usable key: back off at the maximum delay
+        for task in due:
+            if task.user_id not in clients:
+                self._next_check[task.id] = now + TASK_POLL_MAX_DELAY
+
+        if changed:
+            # Separate short session for the writes
+            async with async_session() as db:
+                await bulk_update_tasks(db, changed, changes)
+                await bump_task_versions(db, {task.user_id for task in changed})
+                await db.commit()
+
+        for task, task_changes in zip(changed, changes):
+            task_events.publish(task.user_id, {**task_delta(task), **task_changes})
+        return len(checked)
+
+
+task_poller = TaskPoller()
@@ -0,0 +1,70 @@
+"""
+Task Versions Module
+Per-user version stamp of the task list, for conditional GETs on /api/tasks
+
+Every write to a user's video_tasks rows also bumps that user's counter in
+task_list_versions, in the same transaction, so a listing can be
+revalidated with one primary-key lookup instead of re-running the query.
+Writers: generation queue inserts, the poller, callbacks and on-demand
+refreshes (core.task_sync.refresh_tasks).
+"""
+import hashlib
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from core.database import is_sqlite, TaskListVersion
+
+
+async def bump_task_versions(db, user_ids: Iterable[int]):
+    """
+    Mark these users' task lists as changed (caller commits)
+
+    One upsert for all users; a missing row starts at version 1.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    now = datetime.utcnow()
+    insert = sqlite_insert if is_sqlite() else pg_insert
+    statement = insert(TaskListVersion).values(
+        [{"user_id": user_id, "version": 1, "changed_at": now} for user_id in user_ids]
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[TaskListVersion.user_id],
+        set_={"version": TaskListVersion.version + 1, "changed_at": now}
+    )
+    await db.execute(statement)
+
+
+async def get_task_version(db, user_id: int) -> Tuple[int, Optional[datetime]]:
+    """(version, changed_at) of a user's task list; (0, None) before any write"""
+    row = (await db.execute(
+        select(TaskListVersion.version, TaskListVersion.changed_at)
+        .where(TaskListVersion.user_id == user_id)
+    )).first()
+    if row is None:
+        return 0, None
+    return row.version, row.changed_at
+
+
+def list_etag(user_id: int, version: int, query: str = "") -> str:
+    """Weak ETag for one listing: the user's version plus the exact query"""
+    query_hash = hashlib.sha1(query.encode()).hexdigest()[:12]
+    return f'W/"tasks-{user_id}-{version}-{query_hash}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check with weak comparison (RFC 9110 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == wanted
+        for candidate in if_none_match.split(",")
+    )
@@ -0,0 +1,163 @@
+"""
+Upload Cache Module
+Content-addressed dedupe of Cloudinary uploads
+
+Uploads are keyed by the SHA-256 of the bytes the user sent (combined
+with the normalization variant, see upload_cache_key). A repeat
+upload of the same file returns the stored Cloudinary URL without any
+upstream traffic; entries are re-checked with a HEAD request once they
+are older than UPLOAD_CACHE_VERIFY_HOURS and evicted by age/LRU.
+"""
+import os
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+import httpx
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import UploadedImage
+from core.http_client import get_http_client, operation_timeout
+
+logger = logging.getLogger(__name__)
+
+# Cache config from environment
+UPLOAD_CACHE_ENABLED = os.getenv("UPLOAD_CACHE_ENABLED", "true").lower() == "true"
+UPLOAD_CACHE_MAX_ENTRIES = int(os.getenv("UPLOAD_CACHE_MAX_ENTRIES", "10000"))
+UPLOAD_CACHE_MAX_AGE_DAYS = int(os.getenv("UPLOAD_CACHE_MAX_AGE_DAYS", "30"))
+UPLOAD_CACHE_VERIFY_HOURS = int(os.getenv("UPLOAD_CACHE_VERIFY_HOURS", "24"))
+UPLOAD_CACHE_VERIFY_TIMEOUT = float(os.getenv("UPLOAD_CACHE_VERIFY_TIMEOUT", "5"))
+
+
+def upload_cache_key(content_hash: str, variant: Optional[str] = None) -> str:
+    """Key for an upload; includes the processing variant when the bytes are transformed"""
+    if not variant:
+        return content_hash
+    return hashlib.sha256(f"{content_hash}:{variant}".encode()).hexdigest()
+
+
+async def _still_available(url: str) -> bool:
+    """HEAD the delivery URL; only a definite 404/410 counts as gone"""
+    try:
+        response = await get_http_client().head(
+            url, timeout=operation_timeout(UPLOAD_CACHE_VERIFY_TIMEOUT)
+        )
+    except httpx.HTTPError as e:
+        logger.warning(f"Could not verify cached upload {url}: {e}")
+        return True
+    return response.status_code not in (404, 410)
+
+
+async def lookup_upload(db: AsyncSession, cloud_name: str, content_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Find a previous upload of the same bytes
+
+    Returns:
+        Upload result dict (same shape as ImageHost.upload_file) or None
+    """
+    if not UPLOAD_CACHE_ENABLED:
+        return None
+
+    result = await db.execute(
+        select(UploadedImage).where(
+            UploadedImage.cloud_name == cloud_name,
+            UploadedImage.content_hash == content_hash,
+        )
+    )
+    entry = result.scalar_one_or_none()
+    if not entry:
+        return None
+
+    now = datetime.utcnow()
+    if entry.verified_at is None or now - entry.verified_at > timedelta(hours=UPLOAD_CACHE_VERIFY_HOURS):
+        if not await _still_available(entry.secure_url):
+            logger.info(f"Cached upload {entry.public_id} is gone; uploading again")
+            await db.delete(entry)
+            await db.commit()
+            return None
+        entry.verified_at = now
+
+    entry.last_used_at = now
+    entry.hit_count = (entry.hit_count or 0) + 1
+    await db.commit()
+
+    return {
+        "success": True,
+        "url": entry.secure_url,
+        "public_id": entry.public_id,
+        "width": entry.width,
+        "height": entry.height,
+        "cached": True,
+    }
+
+
+async def remember_upload(
+    db: AsyncSession,
+    cloud_name: str,
+    content_hash: str,
+    result: Dict[str, Any],
+    size_bytes: Optional[int] = None
+):
+    """Record a successful upload, then evict old/excess entries"""
+    if not UPLOAD_CACHE_ENABLED or not result.get("url"):
+        return
+
+    existing = await db.execute(
+        select(UploadedImage).where(
+            UploadedImage.cloud_name == cloud_name,
+            UploadedImage.content_hash == content_hash,
+        )
+    )
+    entry = existing.scalar_one_or_none()
+    if entry is None:
+        entry = UploadedImage(cloud_name=cloud_name, content_hash=content_hash)
+        db.add(entry)
+
+    now = datetime.utcnow()
+    entry.secure_url = result["url"]
+    entry.public_id = result.get("public_id")
+    entry.width = result.get("width")
+    entry.height = result.get("height")
+    entry.size_bytes = size_bytes
+    entry.last_used_at = now
+    entry.verified_at = now
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Same file recorded concurrently by another request
+        await db.rollback()
+        return
+
+    await evict_uploads(db)
+
+
+async def evict_uploads(db: AsyncSession) -> int:
+    """
+    Drop entries unused for UPLOAD_CACHE_MAX_AGE_DAYS, then the least
+    recently used ones beyond UPLOAD_CACHE_MAX_ENTRIES
+
+    Only the dedupe records are removed; the Cloudinary assets stay.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=UPLOAD_CACHE_MAX_AGE_DAYS)
+    removed = (await db.execute(
+        delete(UploadedImage).where(UploadedImage.last_used_at < cutoff)
+    )).rowcount or 0
+
+    count = (await db.execute(select(func.count(UploadedImage.id)))).scalar_one()
+    excess = count - UPLOAD_CACHE_MAX_ENTRIES
+    if excess > 0:
+        oldest = (
+            select(UploadedImage.id)
+            .order_by(UploadedImage.last_used_at.asc())
+            .limit(excess)
+            .scalar_subquery()
+        )
+        removed += (await db.execute(
+            delete(UploadedImage).where(UploadedImage.id.in_(oldest))
+        )).rowcount or 0
+
+    await db.commit()
+    return removed
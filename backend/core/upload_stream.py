@@ -0,0 +1,283 @@
+"""
+Upload Stream Module
+Incremental multipart parsing and base64 decoding for image uploads
+
+The request body is parsed chunk by chunk as it arrives: the size cap is
+enforced on the running byte count and the real image type is sniffed from
+the first bytes, so bad uploads are rejected before the rest is read. The
+content is hashed on the way through (for upload dedupe), and the accepted
+file lands in a spooled temp file (small in memory, rest on disk) that can
+be streamed on to Cloudinary without another full copy.
+"""
+import os
+import base64
+import shutil
+import binascii
+import hashlib
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Optional
+
+from fastapi import HTTPException, Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+# Upload limits from environment
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+
+# Allowance for multipart boundaries/headers when checking Content-Length up front
+_MULTIPART_OVERHEAD = 16 * 1024
+# Base64 text decoded per step (multiple of 4)
+_BASE64_SLICE_CHARS = 256 * 1024
+_BASE64_WHITESPACE = (" ", "\n", "\r", "\t")
+# Enough leading bytes to recognise every allowed format (WEBP needs 12)
+_SNIFF_BYTES = 16
+
+ALLOWED_IMAGE_TYPES = ["image/jpeg", "image/png", "image/webp", "image/gif"]
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Detect an allowed image type from its magic bytes"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    return None
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"File too large. Max {UPLOAD_MAX_BYTES // (1024 * 1024)}MB allowed."
+    )
+
+
+def _invalid_base64() -> HTTPException:
+    return HTTPException(status_code=400, detail="Invalid base64 image data")
+
+
+def _invalid_type() -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_IMAGE_TYPES)}"
+    )
+
+
+@dataclass
+class ReceivedImage:
+    """An accepted image upload, spooled and rewound for reading"""
+    file: BinaryIO
+    filename: Optional[str]
+    content_type: str
+    size: int
+    sha256: str
+
+    def close(self):
+        self.file.close()
+
+    def disk_path(self) -> str:
+        """
+        Path of a named on-disk copy of the content, for worker processes
+
+        The spool (in memory, or an unnamed temp file) is copied over once in
+        chunks and replaces `file`; the copy is removed by close().
+        """
+        if not isinstance(getattr(self.file, "name", None), str):
+            named = tempfile.NamedTemporaryFile(suffix=".upload")
+            self.file.seek(0)
+            shutil.copyfileobj(self.file, named)
+            named.flush()
+            self.file.close()
+            self.file = named
+        self.file.seek(0)
+        return self.file.name
+
+
+class _ImageSink:
+    """Accumulates image bytes: size cap, magic-byte sniffing, hashing, spooling"""
+
+    def __init__(self):
+        self.file = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+        self.content_type: Optional[str] = None
+        self.size = 0
+        self.hasher = hashlib.sha256()
+        self._head = b""
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > UPLOAD_MAX_BYTES:
+            raise _too_large()
+        self.hasher.update(chunk)
+
+        if self.content_type is None:
+            self._head += chunk
+            if len(self._head) < _SNIFF_BYTES:
+                return
+            self._sniff()
+            chunk, self._head = self._head, b""
+        self.file.write(chunk)
+
+    def finish(self, filename: Optional[str]) -> ReceivedImage:
+        """Validate the complete file and rewind it for reading"""
+        if self.size == 0:
+            raise HTTPException(status_code=400, detail="No image file uploaded")
+        if self.content_type is None:
+            # Files shorter than the sniff window
+            self._sniff()
+            self.file.write(self._head)
+            self._head = b""
+        self.file.seek(0)
+        return ReceivedImage(
+            file=self.file,
+            filename=filename,
+            content_type=self.content_type,
+            size=self.size,
+            sha256=self.hasher.hexdigest(),
+        )
+
+    def _sniff(self):
+        self.content_type = sniff_image_type(self._head)
+        if self.content_type is None:
+            raise _invalid_type()
+
+
+class _ImagePartReceiver:
+    """python-multipart callbacks capturing one file field"""
+
+    def __init__(self, field_name: str):
+        self.field_name = field_name.encode()
+        self.sink = _ImageSink()
+        self.filename: Optional[str] = None
+        self.found = False
+        self._capturing = False
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        # Only the first matching file part is kept
+        self._capturing = (
+            not self.found
+            and options.get(b"name") == self.field_name
+            and b"filename" in options
+        )
+        if self._capturing:
+            self.found = True
+            self.filename = options[b"filename"].decode("utf-8", "replace") or None
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._capturing:
+            self.sink.write(data[start:end])
+
+    def on_part_end(self):
+        self._capturing = False
+
+
+async def receive_image_upload(request: Request, field_name: str = "file") -> ReceivedImage:
+    """
+    Stream a multipart/form-data request and return its image file field
+
+    Raises:
+        HTTPException(400): not multipart, missing file, too large or not an allowed image
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type"))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data upload")
+
+    # Cheap early rejection when the client declares the body size
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > UPLOAD_MAX_BYTES + _MULTIPART_OVERHEAD:
+        raise _too_large()
+
+    receiver = _ImagePartReceiver(field_name)
+    parser = MultipartParser(boundary, receiver.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+        if not receiver.found:
+            raise HTTPException(status_code=400, detail="No image file uploaded")
+        return receiver.sink.finish(receiver.filename)
+    except BaseException:
+        receiver.sink.file.close()
+        raise
+
+
+def decode_base64_image(image_base64: str, filename: Optional[str] = None) -> ReceivedImage:
+    """
+    Decode a base64 image (optionally a data URI) in fixed-size slices
+
+    Only one slice of text and its decoded bytes exist at a time besides the
+    spooled output; the declared data URI type is ignored in favour of the
+    sniffed one.
+
+    Raises:
+        HTTPException(400): malformed base64, too large or not an allowed image
+    """
+    start = 0
+    if image_base64.startswith("data:"):
+        comma = image_base64.find(",", 0, 256)
+        if comma == -1:
+            raise HTTPException(status_code=400, detail="Invalid data URI")
+        start = comma + 1
+
+    # Reject from the encoded length alone (4 chars -> 3 bytes)
+    if (len(image_base64) - start) * 3 // 4 > UPLOAD_MAX_BYTES + 3:
+        raise _too_large()
+
+    sink = _ImageSink()
+    try:
+        carry = ""
+        for offset in range(start, len(image_base64), _BASE64_SLICE_CHARS):
+            text = carry + image_base64[offset:offset + _BASE64_SLICE_CHARS]
+            # Tolerate line-wrapped base64
+            if any(ws in text for ws in _BASE64_WHITESPACE):
+                text = "".join(text.split())
+            usable = len(text) - len(text) % 4
+            carry = text[usable:]
+            if usable:
+                sink.write(_b64decode(text[:usable]))
+        if carry:
+            raise _invalid_base64()
+        return sink.finish(filename)
+    except BaseException:
+        sink.file.close()
+        raise
+
+
+def _b64decode(text: str) -> bytes:
+    try:
+        return base64.b64decode(text, validate=True)
+    except (binascii.Error, ValueError):
+        raise _invalid_base64()
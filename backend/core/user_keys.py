@@ -0,0 +1,137 @@
+"""
+User API Keys Module
+Per-process cache of decrypted Kie.ai keys and ready-made KieApiClient instances
+
+Every lookup still reads the user's key row (one indexed lookup on
+user_api_keys.user_id); the cache only saves decrypting the key and building
+a client. An entry is reused while the row's updated_at matches the one it
+was built from, so a key saved or deleted through any worker takes effect
+everywhere on the next lookup.
+"""
+import os
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from pydantic import SecretStr
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.api_client import KieApiClient
+from core.cache import TTLCache
+from core.database import UserApiKey
+from core.encryption import decrypt_value
+
+logger = logging.getLogger(__name__)
+
+# Cache config from environment
+KEY_CACHE_TTL = float(os.getenv("KEY_CACHE_TTL", "300"))
+KEY_CACHE_SIZE = int(os.getenv("KEY_CACHE_SIZE", "1000"))
+
+
+class ApiKeyUnavailable(Exception):
+    """The user has no usable Kie.ai key"""
+
+
+class ApiKeyMissing(ApiKeyUnavailable):
+    """No key saved"""
+
+
+class ApiKeyInvalid(ApiKeyUnavailable):
+    """A key is saved but cannot be decrypted"""
+
+
+@dataclass(frozen=True)
+class UserKieKey:
+    """Decrypted key plus a client bound to it; the secret never appears in repr()"""
+    user_id: int
+    key: SecretStr
+    client: KieApiClient = field(repr=False)
+    # UserApiKey.updated_at the entry was built from
+    updated_at: Optional[datetime] = None
+
+
+_key_cache: TTLCache[UserKieKey] = TTLCache(maxsize=KEY_CACHE_SIZE, ttl=KEY_CACHE_TTL)
+
+
+def _cache_entry(user_id: int, encrypted: Optional[str], updated_at: Optional[datetime]) -> UserKieKey:
+    """
+    Cached entry for a stored key row, rebuilt if the row changed since;
+    failures are not cached
+    """
+    cached = _key_cache.get(user_id)
+    if cached and cached.updated_at == updated_at:
+        return cached
+    _key_cache.invalidate(user_id)
+
+    if not encrypted:
+        raise ApiKeyMissing()
+
+    kie_key = decrypt_value(encrypted)
+    if not kie_key:
+        raise ApiKeyInvalid()
+
+    entry = UserKieKey(
+        user_id=user_id,
+        key=SecretStr(kie_key),
+        client=KieApiClient(api_key=kie_key),
+        updated_at=updated_at,
+    )
+    _key_cache.set(user_id, entry)
+    return entry
+
+
+async def get_user_kie_key(db: AsyncSession, user_id: int) -> UserKieKey:
+    """
+    Get a user's decrypted Kie.ai key and client, from cache when the
+    stored row is unchanged
+
+    Raises:
+        ApiKeyMissing: no key saved
+        ApiKeyInvalid: stored key cannot be decrypted
+    """
+    row = (await db.execute(
+        select(UserApiKey.kie_api_key, UserApiKey.updated_at).where(UserApiKey.user_id == user_id)
+    )).first()
+    if row is None:
+        return _cache_entry(user_id, None, None)
+    return _cache_entry(user_id, row.kie_api_key, row.updated_at)
+
+
+async def get_kie_clients(db: AsyncSession, user_ids: Iterable[int]) -> Dict[int, KieApiClient]:
+    """
+    Clients for many users at once (one query for all of them)
+
+    Users without a usable key are left out of the result.
+    """
+    clients: Dict[int, KieApiClient] = {}
+    user_ids = set(user_ids)
+    if not user_ids:
+        return clients
+
+    result = await db.execute(
+        select(UserApiKey.user_id, UserApiKey.kie_api_key, UserApiKey.updated_at)
+        .where(UserApiKey.user_id.in_(user_ids))
+    )
+    for user_id, encrypted, updated_at in result.all():
+        try:
+            clients[user_id] = _cache_entry(user_id, encrypted, updated_at).client
+        except ApiKeyUnavailable:
+            logger.warning(f"User {user_id} has no usable Kie.ai key")
+
+    # Keys deleted through another worker
+    for user_id in user_ids - clients.keys():
+        _key_cache.invalidate(user_id)
+
+    return clients
+
+
+async def get_kie_client(db: AsyncSession, user_id: int) -> KieApiClient:
+    """Shortcut for get_user_kie_key(...).client"""
+    return (await get_user_kie_key(db, user_id)).client
+
+
+def invalidate_user_key(user_id: int):
+    """Drop a user's cached key at once; other workers notice the row change on their next lookup"""
+    _key_cache.invalidate(user_id)
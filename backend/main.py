@@ -20,11 +20,30 @@ logging.basicConfig(
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database on startup"""
+    """Initialize database, shared HTTP client and background workers"""
     from core.database import init_db
+    from core.http_client import init_http_client, close_http_client
+    from core.task_sync import task_poller
+    from core.generation_queue import generation_queue
+    from core.event_relay import task_event_relay
+    from core.auth import google_certs, user_cache_sync
+    from core.image_host import close_image_pool
     await init_db()
     logging.info("Database initialized")
+    await init_http_client()
+    await google_certs.start()
+    await user_cache_sync.start()
+    await task_poller.start()
+    await generation_queue.start()
+    await task_event_relay.start()
     yield
+    await task_event_relay.stop()
+    await generation_queue.stop()
+    await task_poller.stop()
+    await user_cache_sync.stop()
+    await google_certs.stop()
+    close_image_pool()
+    await close_http_client()
 
 
 # Create FastAPI app
@@ -50,6 +69,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Conditional polling of /api/tasks reads the validators cross-origin
+    expose_headers=["ETag", "Last-Modified"],
 )
 
 # Import and register routes
@@ -59,6 +80,7 @@ from routes.status import router as status_router
 from routes.auth import router as auth_router
 from routes.admin import router as admin_router
 from routes.user import router as user_router
+from routes.callback import router as callback_router
 
 app.include_router(auth_router)
 app.include_router(admin_router)
@@ -66,6 +88,7 @@ app.include_router(user_router)
 app.include_router(upload_router)
 app.include_router(generate_router)
 app.include_router(status_router)
+app.include_router(callback_router)
 
 
 @app.get("/")
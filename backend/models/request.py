@@ -1,6 +1,7 @@
 """
 Pydantic Request Models for API endpoints
 """
+import os
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from enum import Enum
@@ -21,6 +22,13 @@ class PersonaType(str, Enum):
     PRODUCT_ONLY = "product_only"
 
 
+# Prompts are unique per batch (sampled without replacement), so this is a
+# cost/rate limit rather than a uniqueness limit
+MAX_BATCH_COUNT = int(os.getenv("MAX_BATCH_COUNT", "20"))
+# Max task IDs per bulk status request
+STATUS_BATCH_MAX = int(os.getenv("STATUS_BATCH_MAX", "100"))
+
+
 class AspectRatio(str, Enum):
     PORTRAIT = "portrait"
     LANDSCAPE = "landscape"
@@ -43,7 +51,7 @@ class GenerateTaskRequest(BaseModel):
     aspect_ratio: AspectRatio = AspectRatio.PORTRAIT
     duration: int = Field(10, description="Number of frames: 10 or 15")
     remove_watermark: bool = True
-    batch_count: int = Field(1, ge=1, le=5)
+    batch_count: int = Field(1, ge=1, le=MAX_BATCH_COUNT)
 
 
 class UploadImageRequest(BaseModel):
@@ -52,5 +60,19 @@ class UploadImageRequest(BaseModel):
     filename: Optional[str] = None
 
 
+class FinalizeUploadRequest(BaseModel):
+    """Cloudinary's response to a direct (signed) browser upload"""
+    public_id: str
+    version: int
+    signature: str
+    secure_url: str
+    format: str
+    bytes: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
 class CheckStatusRequest(BaseModel):
-    task_ids: List[str]
+    task_ids: List[str] = Field(..., min_length=1, max_length=STATUS_BATCH_MAX)
+    # Ask Kie.ai about tasks that are still running (bounded by a deadline)
+    refresh: bool = True
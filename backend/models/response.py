@@ -2,7 +2,7 @@
 Pydantic Response Models for API endpoints
 """
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from enum import Enum
 
 
@@ -18,20 +18,49 @@ class PreviewPromptResponse(BaseModel):
     prompt: str
     style: str
     persona: str
+    variant_count: Optional[int] = None  # unique prompts this style/persona can produce
 
 
 class UploadImageResponse(BaseModel):
     success: bool
     url: Optional[str] = None
+    cached: bool = False
+    error: Optional[str] = None
+
+
+class UploadSignatureResponse(BaseModel):
+    success: bool
+    upload_url: Optional[str] = None
+    params: Dict[str, Any] = {}  # form fields to post along with the file
+    expires_at: Optional[int] = None
+    max_bytes: Optional[int] = None
     error: Optional[str] = None
 
 
 class GenerateTaskResponse(BaseModel):
     success: bool
     task_ids: List[str] = []
+    # Set when the batch was queued; tasks then arrive via the stream/polling
+    batch_id: Optional[str] = None
+    queued: int = 0
+    error: Optional[str] = None
+
+
+class GenerationJobStatus(BaseModel):
+    """One prompt of a queued batch"""
+    index: int
+    status: str  # queued, running, done, failed
+    attempts: int = 0
+    task_id: Optional[str] = None  # failed jobs: ID of their failed placeholder task
     error: Optional[str] = None
 
 
+class GenerationBatchResponse(BaseModel):
+    batch_id: str
+    pending: int = 0
+    jobs: List[GenerationJobStatus] = []
+
+
 class VideoTaskStatus(BaseModel):
     task_id: str
     status: TaskStatus
@@ -44,11 +73,23 @@ class VideoTaskStatus(BaseModel):
 
 class CheckStatusResponse(BaseModel):
     tasks: List[VideoTaskStatus]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+class TaskStatusBatchResponse(BaseModel):
+    """Bulk status for an explicit list of task IDs"""
+    tasks: List[VideoTaskStatus]
+    missing: List[str] = []  # IDs that aren't this user's tasks
+    refreshed: int = 0  # rows updated from Kie.ai by this request
+    timed_out: int = 0  # still unanswered at the deadline (DB state returned)
 
 
 class CreditBalanceResponse(BaseModel):
     success: bool
     credits: Optional[int] = None
+    cached: bool = False
+    age_seconds: Optional[float] = None
     error: Optional[str] = None
 
 
@@ -7,7 +7,10 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.database import get_db, User
-from core.auth import require_admin
+from core.auth import CachedUser, require_admin, invalidate_user_cache
+from core.user_keys import invalidate_user_key
+from core.rate_limit import kie_rate_limiter
+from core.retry import kie_breakers
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -31,7 +34,7 @@ class UserListResponse(BaseModel):
 
 @router.get("/users", response_model=UserListResponse)
 async def list_users(
-    admin: User = Depends(require_admin),
+    admin: CachedUser = Depends(require_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """List all registered users (admin only)"""
@@ -54,10 +57,25 @@ async def list_users(
     )
 
 
+@router.get("/rate-limits")
+async def rate_limit_stats(
+    admin: CachedUser = Depends(require_admin)
+):
+    """Kie.ai rate limiter wait-time metrics and circuit states per kind of call (this process)"""
+    return {
+        "limits": {
+            kind: {"rate_per_second": rate, "burst": burst}
+            for kind, (rate, burst) in kie_rate_limiter.limits.items()
+        },
+        "stats": kie_rate_limiter.snapshot(),
+        "circuits": {kind: breaker.snapshot() for kind, breaker in kie_breakers.items()},
+    }
+
+
 @router.put("/users/{user_id}/approve")
 async def approve_user(
     user_id: int,
-    admin: User = Depends(require_admin),
+    admin: CachedUser = Depends(require_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """Approve a user (admin only)"""
@@ -68,6 +86,7 @@ async def approve_user(
         raise HTTPException(status_code=404, detail="User not found")
 
     user.is_approved = True
+    await invalidate_user_cache(db, user_id)
     await db.commit()
 
     return {"success": True, "message": f"User {user.email} approved"}
@@ -76,7 +95,7 @@ async def approve_user(
 @router.put("/users/{user_id}/reject")
 async def reject_user(
     user_id: int,
-    admin: User = Depends(require_admin),
+    admin: CachedUser = Depends(require_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """Reject/ban a user (admin only)"""
@@ -90,6 +109,7 @@ async def reject_user(
         raise HTTPException(status_code=400, detail="Cannot reject admin users")
 
     user.is_approved = False
+    await invalidate_user_cache(db, user_id)
     await db.commit()
 
     return {"success": True, "message": f"User {user.email} rejected"}
@@ -98,7 +118,7 @@ async def reject_user(
 @router.delete("/users/{user_id}")
 async def delete_user(
     user_id: int,
-    admin: User = Depends(require_admin),
+    admin: CachedUser = Depends(require_admin),
     db: AsyncSession = Depends(get_db)
 ):
     """Delete a user permanently (admin only)"""
@@ -115,6 +135,8 @@ async def delete_user(
         raise HTTPException(status_code=400, detail="Cannot delete other admin users")
 
     await db.delete(user)
+    await invalidate_user_cache(db, user_id)
     await db.commit()
+    invalidate_user_key(user_id)
 
     return {"success": True, "message": f"User {user.email} deleted permanently"}
@@ -7,7 +7,9 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.database import get_db, User, UserApiKey
-from core.auth import verify_google_token, create_jwt, get_current_user, is_admin_email
+from core.auth import (
+    CachedUser, verify_google_token, create_jwt, get_current_user, is_admin_email, invalidate_user_cache
+)
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -46,7 +48,7 @@ async def google_login(
     Returns JWT token and user info.
     """
     # Verify Google token
-    google_info = verify_google_token(request.id_token)
+    google_info = await verify_google_token(request.id_token)
     email = google_info["email"].lower()
 
     # Find or create user
@@ -75,6 +77,7 @@ async def google_login(
         # Update profile info
         user.name = google_info["name"]
         user.avatar_url = google_info.get("picture")
+        await invalidate_user_cache(db, user.id)
         await db.commit()
 
     # Create JWT
@@ -105,7 +108,7 @@ async def google_login(
 
 
 @router.get("/me", response_model=LoginResponse)
-async def get_me(user: User = Depends(get_current_user)):
+async def get_me(user: CachedUser = Depends(get_current_user)):
     """Get current authenticated user info"""
     return LoginResponse(
         success=True,
@@ -0,0 +1,95 @@
+"""
+Callback Routes - Kie.ai webhook receiver for task completion and progress
+"""
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.api_client import KieApiClient
+from core.callbacks import verify_callback_token, verify_kie_signature
+from core.database import get_db, VideoTask
+from core.events import task_events
+from core.task_sync import apply_status_update
+from core.task_versions import bump_task_versions
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/callback", tags=["callback"])
+
+
+async def _handle_kie_callback(
+    request: Request,
+    uid: int,
+    token: str,
+    db: AsyncSession
+) -> dict:
+    """Verify a Kie.ai callback and apply it to the matching VideoTask row"""
+    if not verify_callback_token(uid, token):
+        raise HTTPException(status_code=401, detail="Invalid callback token")
+
+    try:
+        body = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    task_data = body.get("data") or body
+    if not isinstance(task_data, dict):
+        raise HTTPException(status_code=400, detail="Invalid callback data")
+    task_id = task_data.get("taskId") or task_data.get("task_id")
+    if not task_id:
+        raise HTTPException(status_code=400, detail="Missing taskId")
+
+    if not verify_kie_signature(
+        task_id,
+        request.headers.get("X-Webhook-Timestamp"),
+        request.headers.get("X-Webhook-Signature")
+    ):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+    result = await db.execute(
+        select(VideoTask).where(
+            VideoTask.kie_task_id == task_id,
+            VideoTask.user_id == uid
+        )
+    )
+    task = result.scalar_one_or_none()
+
+    # Unknown task: acknowledge so Kie.ai stops retrying
+    if not task:
+        logger.warning(f"Callback for unknown task {task_id} (user {uid})")
+        return {"success": True, "updated": False}
+
+    status_res = KieApiClient.parse_task_record(task_id, task_data)
+    updated = apply_status_update(task, status_res)
+    if updated:
+        await bump_task_versions(db, [task.user_id])
+        await db.commit()
+        task_events.publish_task(task)
+
+    return {"success": True, "updated": updated}
+
+
+@router.post("/kie")
+async def kie_callback(
+    request: Request,
+    uid: int = Query(...),
+    token: str = Query(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """Receive Kie.ai task completion callback (callBackUrl)"""
+    return await _handle_kie_callback(request, uid, token, db)
+
+
+@router.post("/kie/progress")
+async def kie_progress_callback(
+    request: Request,
+    uid: int = Query(...),
+    token: str = Query(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """Receive Kie.ai task progress callback (progressCallBackUrl)"""
+    return await _handle_kie_callback(request, uid, token, db)
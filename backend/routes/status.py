@@ -1,94 +1,267 @@
 """
 Status Routes - Check video generation task status
 """
-from fastapi import APIRouter, Depends, Query
-from typing import List
-from sqlalchemy import select
+import os
+import json
+import base64
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Tuple
+from sqlalchemy import select, func, or_, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models.response import CheckStatusResponse, VideoTaskStatus, TaskStatus
-from core.api_client import KieApiClient
-from core.auth import require_approved
-from core.database import get_db, User, UserApiKey, VideoTask
-from core.encryption import decrypt_value
+from models.request import CheckStatusRequest
+from models.response import CheckStatusResponse, TaskStatusBatchResponse, VideoTaskStatus, TaskStatus
+from core.auth import CachedUser, require_approved, require_approved_stream
+from core.database import get_db, VideoTask
+from core.events import task_events
+from core.rate_limit import kie_rate_limiter
+from core.task_sync import ACTIVE_STATUSES, refresh_tasks
+from core.task_versions import get_task_version, list_etag, etag_matches
+from core.user_keys import get_kie_client, ApiKeyUnavailable
 
 router = APIRouter(prefix="/api", tags=["status"])
 
+# Seconds between SSE keep-alive comments (keeps proxies from closing idle streams)
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
 
-@router.get("/tasks", response_model=CheckStatusResponse)
+# History page sizes
+TASKS_DEFAULT_PAGE_SIZE = int(os.getenv("TASKS_DEFAULT_PAGE_SIZE", "50"))
+TASKS_MAX_PAGE_SIZE = int(os.getenv("TASKS_MAX_PAGE_SIZE", "200"))
+
+# Bulk status: total time allowed for upstream refresh, and rows synced this
+# recently (by the poller or a callback) are answered from the DB
+STATUS_REFRESH_DEADLINE = float(os.getenv("STATUS_REFRESH_DEADLINE", "4"))
+STATUS_REFRESH_MIN_AGE = float(os.getenv("STATUS_REFRESH_MIN_AGE", "5"))
+
+# Only the columns the response needs (no ORM identity map per row)
+_TASK_COLUMNS = (
+    VideoTask.id,
+    VideoTask.kie_task_id,
+    VideoTask.status,
+    VideoTask.progress,
+    VideoTask.video_url,
+    VideoTask.thumbnail_url,
+    VideoTask.error,
+    VideoTask.created_at,
+)
+
+
+def _encode_cursor(created_at: datetime, task_pk: int) -> str:
+    """Opaque keyset cursor for the (created_at, id) position of a row"""
+    raw = f"{created_at.isoformat()}|{task_pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, task_pk = raw.rsplit("|", 1)
+        return naive_utc(datetime.fromisoformat(created_at)), int(task_pk)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Timestamps are stored as naive UTC; convert aware query values (e.g. "...Z") to match"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _to_task_status(t) -> VideoTaskStatus:
+    """Convert a VideoTask row to the response format"""
+    # Convert DB status to Enum if needed, or simple string
+    try:
+        status_enum = TaskStatus(t.status)
+    except ValueError:
+        status_enum = TaskStatus.PENDING
+
+    return VideoTaskStatus(
+        task_id=t.kie_task_id,
+        status=status_enum,
+        progress=t.progress or 0,
+        video_url=t.video_url,
+        thumbnail_url=t.thumbnail_url,
+        error=t.error,
+        created_at=t.created_at.isoformat() if t.created_at else None
+    )
+
+
+@router.get(
+    "/tasks",
+    response_model=CheckStatusResponse,
+    responses={304: {"description": "Unchanged since the ETag in If-None-Match"}}
+)
 async def get_tasks(
-    user: User = Depends(require_approved),
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(TASKS_DEFAULT_PAGE_SIZE, ge=1, le=TASKS_MAX_PAGE_SIZE),
+    status: Optional[List[TaskStatus]] = Query(None),
+    style: Optional[str] = Query(None),
+    product: Optional[str] = Query(None, description="Case-insensitive product name match"),
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None),
+    include_total: bool = Query(False, description="Also count all rows matching the filters"),
+    all_tasks: bool = Query(False, alias="all", description="Return the full history in one response (no paging)"),
+    user: CachedUser = Depends(require_approved),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Get user's video history and sync status of active tasks.
+    Get user's video history, newest first, keyset-paginated on (created_at, id).
+    Active tasks are kept in sync by the background poller (core.task_sync).
+
+    Responses carry an ETag from the user's task list version; send it
+    back as If-None-Match to get a 304 without any rows being loaded.
     """
-    # Get user's API key (for sync)
-    result = await db.execute(
-        select(UserApiKey).where(UserApiKey.user_id == user.id)
+    # Read the version before the rows: a write in between only makes the
+    # ETag older than the payload, which costs a refetch, never a stale 304
+    version, changed_at = await get_task_version(db, user.id)
+    etag = list_etag(user.id, version, request.url.query)
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if changed_at is not None:
+        cache_headers["Last-Modified"] = format_datetime(changed_at.replace(tzinfo=timezone.utc), usegmt=True)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers=cache_headers)
+    response.headers.update(cache_headers)
+
+    filters = [VideoTask.user_id == user.id]
+    if status:
+        filters.append(VideoTask.status.in_([s.value for s in status]))
+    if style:
+        filters.append(VideoTask.style == style)
+    if product:
+        # Match the text literally: user input must not add LIKE wildcards
+        pattern = product.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        filters.append(VideoTask.product_name.ilike(f"%{pattern}%", escape="\\"))
+    if created_from:
+        filters.append(VideoTask.created_at >= naive_utc(created_from))
+    if created_to:
+        filters.append(VideoTask.created_at < naive_utc(created_to))
+
+    total = None
+    if include_total:
+        total = (await db.execute(
+            select(func.count()).select_from(VideoTask).where(*filters)
+        )).scalar_one()
+
+    query = (
+        select(*_TASK_COLUMNS)
+        .where(*filters)
+        .order_by(VideoTask.created_at.desc(), VideoTask.id.desc())
     )
-    api_keys = result.scalar_one_or_none()
-    
-    client = None
-    if api_keys and api_keys.kie_api_key:
-        kie_key = decrypt_value(api_keys.kie_api_key)
-        if kie_key:
-            client = KieApiClient(api_key=kie_key)
-
-    # 1. Get ALL active tasks for user
-    active_result = await db.execute(
+
+    if all_tasks:
+        rows = (await db.execute(query)).all()
+        return CheckStatusResponse(tasks=[_to_task_status(r) for r in rows], total=total)
+
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        query = query.where(or_(
+            VideoTask.created_at < cursor_created_at,
+            and_(VideoTask.created_at == cursor_created_at, VideoTask.id < cursor_id)
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return CheckStatusResponse(
+        tasks=[_to_task_status(r) for r in rows],
+        next_cursor=next_cursor,
+        total=total
+    )
+
+
+@router.post("/tasks/status", response_model=TaskStatusBatchResponse)
+async def check_task_status(
+    request: CheckStatusRequest,
+    user: CachedUser = Depends(require_approved),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Status of specific tasks (e.g. the ones just created), in request order.
+
+    One indexed IN query; tasks still running are refreshed from Kie.ai
+    concurrently (within the key's status budget) until
+    STATUS_REFRESH_DEADLINE, and anything unanswered by then is returned
+    as stored.
+    """
+    task_ids = list(dict.fromkeys(request.task_ids))
+    result = await db.execute(
         select(VideoTask).where(
             VideoTask.user_id == user.id,
-            VideoTask.status.in_(["pending", "processing"])
+            VideoTask.kie_task_id.in_(task_ids)
         )
     )
-    active_tasks = active_result.scalars().all()
+    by_id = {task.kie_task_id: task for task in result.scalars().all()}
 
-    # 2. Sync active tasks with Kie.ai
-    if client and active_tasks:
-        for task in active_tasks:
+    refreshed, timed_out = [], 0
+    if request.refresh:
+        stale_before = datetime.utcnow() - timedelta(seconds=STATUS_REFRESH_MIN_AGE)
+        stale = [
+            task for task in by_id.values()
+            if task.status in ACTIVE_STATUSES
+            and (task.updated_at is None or task.updated_at < stale_before)
+        ]
+        if stale:
             try:
-                # Call Kie API
-                status_res = await client.get_task_status(task.kie_task_id)
-                
-                # Update DB
-                task.status = status_res.get("status", "pending")
-                task.progress = status_res.get("progress", 0)
-                if status_res.get("video_url"):
-                    task.video_url = status_res.get("video_url")
-                if status_res.get("thumbnail_url"):
-                    task.thumbnail_url = status_res.get("thumbnail_url")
-                if status_res.get("error"):
-                    task.error = status_res.get("error")
-                
-            except Exception as e:
-                print(f"Error syncing task {task.kie_task_id}: {e}")
-        
-        await db.commit()
-
-    # 3. Get ALL tasks (active + history) sorted by date details
-    final_result = await db.execute(
-        select(VideoTask).where(VideoTask.user_id == user.id).order_by(VideoTask.created_at.desc())
+                client = await get_kie_client(db, user.id)
+            except ApiKeyUnavailable:
+                client = None
+            if client is not None:
+                # Don't queue behind the rate limiter; the poller covers the rest
+                stale = stale[:kie_rate_limiter.available(client.key_id, "status")]
+                refreshed, timed_out = await refresh_tasks(db, client, stale, STATUS_REFRESH_DEADLINE)
+
+    return TaskStatusBatchResponse(
+        tasks=[_to_task_status(by_id[task_id]) for task_id in task_ids if task_id in by_id],
+        missing=[task_id for task_id in task_ids if task_id not in by_id],
+        refreshed=len(refreshed),
+        timed_out=timed_out
     )
-    all_tasks = final_result.scalars().all()
 
-    # Convert to response format
-    task_dtos = []
-    for t in all_tasks:
-        # Convert DB status to Enum if needed, or simple string
+
+@router.get("/tasks/stream")
+async def stream_tasks(
+    request: Request,
+    user: CachedUser = Depends(require_approved_stream)
+):
+    """
+    Server-Sent Events stream of task changes for the current user.
+    Each "task" event carries one VideoTaskStatus delta; no DB reads per subscriber,
+    and no DB session is held while the stream is open.
+    """
+    user_id = user.id
+    queue = task_events.subscribe(user_id)
+
+    async def event_stream():
         try:
-            status_enum = TaskStatus(t.status)
-        except:
-            status_enum = TaskStatus.PENDING
-
-        task_dtos.append(VideoTaskStatus(
-            task_id=t.kie_task_id,
-            status=status_enum,
-            progress=t.progress or 0,
-            video_url=t.video_url,
-            thumbnail_url=t.thumbnail_url,
-            error=t.error,
-            created_at=t.created_at.isoformat() if t.created_at else None
-        ))
+            yield "retry: 5000\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: task\ndata: {json.dumps(event)}\n\n"
+        finally:
+            task_events.unsubscribe(user_id, queue)
 
-    return CheckStatusResponse(tasks=task_dtos)
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        }
+    )
@@ -2,19 +2,43 @@
 Upload Routes - Image upload to Cloudinary (global config)
 """
 import os
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+import time
+import asyncio
+import logging
+import secrets
+from typing import Optional
 
-from models.response import UploadImageResponse
-from models.request import UploadImageRequest
-from core.image_host import ImageHost
-from core.auth import require_approved
-from core.database import User
+import cloudinary.uploader
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.response import UploadImageResponse, UploadSignatureResponse
+from models.request import UploadImageRequest, FinalizeUploadRequest, AspectRatio
+from core.image_host import ImageHost, IMAGE_NORMALIZE_ENABLED, normalization_variant, normalize_for_upload
+from core.upload_cache import lookup_upload, remember_upload, upload_cache_key
+from core.upload_stream import ReceivedImage, decode_base64_image, receive_image_upload, UPLOAD_MAX_BYTES
+from core.auth import CachedUser, require_approved
+from core.database import get_db
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["upload"])
 
 # Global Cloudinary config from environment
 CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME", "")
 CLOUDINARY_UPLOAD_PRESET = os.getenv("CLOUDINARY_UPLOAD_PRESET", "")
+# Needed only for signed direct uploads from the browser
+CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY", "")
+CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET", "")
+CLOUDINARY_UPLOAD_FOLDER = os.getenv("CLOUDINARY_UPLOAD_FOLDER", "aff-video-gen")
+
+# Direct upload restrictions
+UPLOAD_SIGNATURE_TTL = int(os.getenv("UPLOAD_SIGNATURE_TTL", "600"))
+DIRECT_UPLOAD_FORMATS = ["jpg", "png", "webp"]
+# Incoming transformation: Cloudinary downscales on ingest (same limit as normalize_image)
+DIRECT_UPLOAD_TRANSFORMATION = "c_limit,w_1707,h_1707"
+# Cloudinary accepts a signed request for this long after its timestamp
+_CLOUDINARY_SIGNATURE_WINDOW = 3600
 
 
 def get_image_host() -> ImageHost:
@@ -30,32 +54,117 @@ def get_image_host() -> ImageHost:
     )
 
 
-@router.post("/upload-image", response_model=UploadImageResponse)
+def get_signing_image_host() -> ImageHost:
+    """ImageHost with API credentials, for signed direct uploads"""
+    if not CLOUDINARY_CLOUD_NAME or not CLOUDINARY_API_KEY or not CLOUDINARY_API_SECRET:
+        raise HTTPException(
+            status_code=503,
+            detail="Direct uploads not configured. Set CLOUDINARY_API_KEY and CLOUDINARY_API_SECRET in .env"
+        )
+    return ImageHost(
+        cloud_name=CLOUDINARY_CLOUD_NAME,
+        upload_preset=CLOUDINARY_UPLOAD_PRESET,
+        api_key=CLOUDINARY_API_KEY,
+        api_secret=CLOUDINARY_API_SECRET
+    )
+
+
+def _user_upload_folder(user: CachedUser) -> str:
+    return f"{CLOUDINARY_UPLOAD_FOLDER}/u{user.id}"
+
+
+@router.post(
+    "/upload-image",
+    response_model=UploadImageResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                    }
+                }
+            },
+        }
+    },
+)
 async def upload_image(
-    file: UploadFile = File(...),
-    user: User = Depends(require_approved)
+    request: Request,
+    aspect_ratio: Optional[AspectRatio] = Query(
+        None, description="Video frame to size the image for (default: cover both)"
+    ),
+    user: CachedUser = Depends(require_approved),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Upload an image file to Cloudinary.
     Uses global Cloudinary config from .env
+
+    The body is streamed: size and type (by magic bytes) are checked as
+    it arrives, and the spooled file is streamed on to Cloudinary.
+    Images are normalized first (EXIF orientation, downscaled to the video
+    frame, metadata stripped, JPEG). Repeat uploads of identical bytes are
+    served from the upload cache.
     """
-    # Validate file type
-    allowed_types = ["image/jpeg", "image/png", "image/webp", "image/gif"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}"
-        )
+    host = get_image_host()
+    image = await receive_image_upload(request)
+    public_id = image.filename.rsplit(".", 1)[0] if image.filename else None
+    return await _store_image(host, image, public_id, aspect_ratio, db)
+
 
-    # Check file size (max 10MB)
-    content = await file.read()
-    if len(content) > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large. Max 10MB allowed.")
+@router.post("/upload-image-base64", response_model=UploadImageResponse)
+async def upload_image_base64(
+    request: UploadImageRequest,
+    aspect_ratio: Optional[AspectRatio] = Query(
+        None, description="Video frame to size the image for (default: cover both)"
+    ),
+    user: CachedUser = Depends(require_approved),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Upload a base64-encoded image to Cloudinary
 
-    # Upload to Cloudinary
+    Decoded incrementally into a spooled file (type sniffed, size capped),
+    then handled exactly like a file upload.
+    """
     host = get_image_host()
-    filename = file.filename.rsplit(".", 1)[0] if file.filename else None
-    result = await host.upload_file(content, filename)
+    image = decode_base64_image(request.image_base64, request.filename)
+    return await _store_image(host, image, request.filename, aspect_ratio, db)
+
+
+async def _store_image(
+    host: ImageHost,
+    image: ReceivedImage,
+    public_id: Optional[str],
+    aspect_ratio: Optional[AspectRatio],
+    db: AsyncSession
+) -> UploadImageResponse:
+    """Dedupe, normalize and upload a received image (closes it)"""
+    aspect = aspect_ratio.value if aspect_ratio else None
+    variant = normalization_variant(aspect) if IMAGE_NORMALIZE_ENABLED else None
+    cache_key = upload_cache_key(image.sha256, variant)
+
+    try:
+        # Same bytes uploaded before: reuse the Cloudinary URL
+        result = await lookup_upload(db, host.cloud_name, cache_key)
+        if result is None:
+            normalized = None
+            if IMAGE_NORMALIZE_ENABLED:
+                normalized = await normalize_for_upload(image.disk_path(), aspect)
+
+            if normalized:
+                result = await host.upload_file(normalized.data, public_id, content_type=normalized.content_type)
+            else:
+                image.file.seek(0)
+                result = await host.upload_file(image.file, public_id, content_type=image.content_type)
+
+            if result.get("success"):
+                await remember_upload(db, host.cloud_name, cache_key, result, image.size)
+    finally:
+        image.close()
 
     if not result.get("success"):
         return UploadImageResponse(
@@ -65,26 +174,84 @@ async def upload_image(
 
     return UploadImageResponse(
         success=True,
-        url=result.get("url")
+        url=result.get("url"),
+        cached=result.get("cached", False)
     )
 
 
-@router.post("/upload-image-base64", response_model=UploadImageResponse)
-async def upload_image_base64(
-    request: UploadImageRequest,
-    user: User = Depends(require_approved)
+@router.post("/upload-signature", response_model=UploadSignatureResponse)
+async def create_upload_signature(
+    user: CachedUser = Depends(require_approved)
 ):
-    """Upload a base64-encoded image to Cloudinary"""
-    host = get_image_host()
-    result = await host.upload_base64(request.image_base64, request.filename)
+    """
+    Sign a direct browser-to-Cloudinary upload
 
-    if not result.get("success"):
-        return UploadImageResponse(
-            success=False,
-            error=result.get("error", "Upload failed")
-        )
+    The signature is scoped to one public_id in the user's folder, to
+    image formats we accept and to an ingest downscale. The browser posts
+    `params` plus the file to `upload_url`, then calls /upload-finalize.
+    """
+    host = get_signing_image_host()
 
-    return UploadImageResponse(
+    # Cloudinary honours a signature for an hour after its timestamp; backdating
+    # the timestamp shortens that window to UPLOAD_SIGNATURE_TTL
+    now = int(time.time())
+    ttl = min(UPLOAD_SIGNATURE_TTL, _CLOUDINARY_SIGNATURE_WINDOW)
+    timestamp = now - (_CLOUDINARY_SIGNATURE_WINDOW - ttl)
+
+    params = {
+        "folder": _user_upload_folder(user),
+        "public_id": secrets.token_hex(12),
+        "allowed_formats": ",".join(DIRECT_UPLOAD_FORMATS),
+        "transformation": DIRECT_UPLOAD_TRANSFORMATION,
+    }
+    signed = host.get_upload_signature(params, timestamp=timestamp)
+    if not signed.get("success"):
+        return UploadSignatureResponse(success=False, error=signed.get("error", "Signing failed"))
+
+    return UploadSignatureResponse(
         success=True,
-        url=result.get("url")
+        upload_url=f"https://api.cloudinary.com/v1_1/{host.cloud_name}/image/upload",
+        params={
+            **params,
+            "timestamp": signed["timestamp"],
+            "signature": signed["signature"],
+            "api_key": signed["api_key"],
+        },
+        expires_at=now + ttl,
+        max_bytes=UPLOAD_MAX_BYTES,
     )
+
+
+@router.post("/upload-finalize", response_model=UploadImageResponse)
+async def finalize_upload(
+    request: FinalizeUploadRequest,
+    user: CachedUser = Depends(require_approved)
+):
+    """
+    Accept a direct upload after checking Cloudinary's response signature
+    and that it matches what /upload-signature allowed for this user
+    """
+    host = get_signing_image_host()
+
+    if not host.verify_response_signature(request.public_id, request.version, request.signature):
+        raise HTTPException(status_code=400, detail="Invalid upload signature")
+
+    if not request.public_id.startswith(_user_upload_folder(user) + "/"):
+        raise HTTPException(status_code=403, detail="Upload does not belong to this user")
+
+    expected_prefix = f"https://res.cloudinary.com/{host.cloud_name}/image/upload/"
+    if not request.secure_url.startswith(expected_prefix) or request.public_id not in request.secure_url:
+        raise HTTPException(status_code=400, detail="Upload URL does not match the signed upload")
+
+    if request.format not in DIRECT_UPLOAD_FORMATS or request.bytes > UPLOAD_MAX_BYTES:
+        # Outside what we accept: remove it so it can't be used
+        try:
+            await asyncio.to_thread(cloudinary.uploader.destroy, request.public_id, invalidate=True)
+        except Exception as e:
+            logger.warning(f"Could not delete rejected upload {request.public_id}: {e}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Upload rejected. Allowed: {', '.join(DIRECT_UPLOAD_FORMATS)} up to {UPLOAD_MAX_BYTES // (1024 * 1024)}MB"
+        )
+
+    return UploadImageResponse(success=True, url=request.secure_url)
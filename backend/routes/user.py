@@ -1,16 +1,20 @@
 """
 User Routes — API key management and credit balance
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.database import get_db, User, UserApiKey
-from core.auth import require_approved
-from core.encryption import encrypt_value, decrypt_value, mask_api_key
-from core.api_client import KieApiClient
+from core.database import get_db, UserApiKey
+from core.auth import CachedUser, require_approved
+from core.credits import credit_balances
+from core.encryption import encrypt_value, mask_api_key
+from core.user_keys import (
+    get_user_kie_key, get_kie_client, invalidate_user_key,
+    ApiKeyMissing, ApiKeyInvalid,
+)
 
 router = APIRouter(prefix="/api/user", tags=["user"])
 
@@ -28,36 +32,35 @@ class SaveApiKeysRequest(BaseModel):
 class CreditBalanceResponse(BaseModel):
     success: bool
     credits: Optional[int] = None
+    cached: bool = False
+    age_seconds: Optional[float] = None
     error: Optional[str] = None
 
 
 @router.get("/api-keys", response_model=ApiKeysResponse)
 async def get_api_keys(
-    user: User = Depends(require_approved),
+    user: CachedUser = Depends(require_approved),
     db: AsyncSession = Depends(get_db)
 ):
     """Get saved API keys (masked for security)"""
-    result = await db.execute(
-        select(UserApiKey).where(UserApiKey.user_id == user.id)
-    )
-    api_keys = result.scalar_one_or_none()
-
-    if not api_keys or not api_keys.kie_api_key:
+    try:
+        kie_key = await get_user_kie_key(db, user.id)
+    except ApiKeyMissing:
         return ApiKeysResponse(success=True)
-
-    decrypted = decrypt_value(api_keys.kie_api_key)
+    except ApiKeyInvalid:
+        return ApiKeysResponse(success=True, kie_api_key_masked=mask_api_key(""))
 
     return ApiKeysResponse(
         success=True,
-        kie_api_key_masked=mask_api_key(decrypted),
-        has_kie_key=bool(decrypted),
+        kie_api_key_masked=mask_api_key(kie_key.key.get_secret_value()),
+        has_kie_key=True,
     )
 
 
 @router.put("/api-keys")
 async def save_api_keys(
     request: SaveApiKeysRequest,
-    user: User = Depends(require_approved),
+    user: CachedUser = Depends(require_approved),
     db: AsyncSession = Depends(get_db)
 ):
     """Save or update API keys"""
@@ -74,44 +77,42 @@ async def save_api_keys(
         api_keys.kie_api_key = encrypt_value(request.kie_api_key)
 
     await db.commit()
+    invalidate_user_key(user.id)
 
     return {"success": True, "message": "API keys saved"}
 
 
 @router.get("/credit-balance", response_model=CreditBalanceResponse)
 async def get_credit_balance(
-    user: User = Depends(require_approved),
+    refresh: bool = Query(False, description="Bypass the cache and ask Kie.ai"),
+    user: CachedUser = Depends(require_approved),
     db: AsyncSession = Depends(get_db)
 ):
-    """Check Kie.ai credit balance for current user"""
-    result = await db.execute(
-        select(UserApiKey).where(UserApiKey.user_id == user.id)
-    )
-    api_keys = result.scalar_one_or_none()
-
-    if not api_keys or not api_keys.kie_api_key:
+    """Check Kie.ai credit balance for current user (cached briefly per key)"""
+    try:
+        client = await get_kie_client(db, user.id)
+    except ApiKeyMissing:
         return CreditBalanceResponse(
             success=False,
             error="No Kie.ai API key configured"
         )
-
-    decrypted_key = decrypt_value(api_keys.kie_api_key)
-    if not decrypted_key:
+    except ApiKeyInvalid:
         return CreditBalanceResponse(
             success=False,
             error="Invalid stored API key"
         )
 
-    client = KieApiClient(api_key=decrypted_key)
-    balance = await client.get_credit_balance()
+    balance = await credit_balances.get(client, force_refresh=refresh)
 
-    if not balance.get("success"):
+    if not balance.success:
         return CreditBalanceResponse(
             success=False,
-            error=balance.get("error", "Failed to check balance")
+            error=balance.error
         )
 
     return CreditBalanceResponse(
         success=True,
-        credits=balance.get("credits", 0)
+        credits=balance.credits,
+        cached=balance.cached,
+        age_seconds=round(balance.age_seconds, 1)
     )
@@ -0,0 +1,105 @@
+"""
+DB Concurrency Benchmark
+Compares SQLite storage profiles under concurrent task writes and history reads,
+the mix produced by batch task creation, status sync and dashboard polling.
+
+Usage (from backend/):
+    python -m scripts.bench_db_concurrency [--writers 8] [--readers 8] [--ops 200]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import OperationalError
+
+
+async def run_profile(profile: str, writers: int, readers: int, ops: int) -> dict:
+    from core.database import build_engine, User, VideoTask
+    from core.migrations import run_migrations
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = build_engine(f"sqlite+aiosqlite:///{path}", profile=profile)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(run_migrations)
+        await conn.execute(insert(User), [
+            {"email": f"user{i}@bench", "name": f"user{i}", "is_approved": True}
+            for i in range(writers)
+        ])
+
+    stats = {"writes": 0, "reads": 0, "locked": 0}
+
+    async def writer(user_id: int):
+        for i in range(ops):
+            try:
+                async with session_factory() as db:
+                    await db.execute(insert(VideoTask), [{
+                        "user_id": user_id,
+                        "kie_task_id": f"{user_id}-{i}",
+                        "status": "pending",
+                        "created_at": datetime.utcnow(),
+                    }])
+                    await db.execute(
+                        update(VideoTask)
+                        .where(VideoTask.user_id == user_id, VideoTask.status == "pending")
+                        .values(status="processing", progress=50)
+                    )
+                    await db.commit()
+                stats["writes"] += 1
+            except OperationalError:
+                stats["locked"] += 1
+
+    async def reader(user_id: int):
+        for _ in range(ops):
+            try:
+                async with session_factory() as db:
+                    await db.execute(
+                        select(VideoTask.id, VideoTask.status, VideoTask.created_at)
+                        .where(VideoTask.user_id == user_id)
+                        .order_by(VideoTask.created_at.desc(), VideoTask.id.desc())
+                        .limit(50)
+                    )
+                stats["reads"] += 1
+            except OperationalError:
+                stats["locked"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(writer(i % writers + 1) for i in range(writers)),
+        *(reader(i % writers + 1) for i in range(readers)),
+    )
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+
+    total = stats["writes"] + stats["reads"]
+    return {**stats, "seconds": elapsed, "ops_per_sec": total / elapsed if elapsed else 0}
+
+
+async def main(args):
+    results = {}
+    for profile in ("default", "tuned"):
+        results[profile] = await run_profile(profile, args.writers, args.readers, args.ops)
+        r = results[profile]
+        print(
+            f"{profile:>8}: {r['seconds']:.2f}s  {r['ops_per_sec']:.0f} ops/s  "
+            f"writes={r['writes']} reads={r['reads']} locked={r['locked']}"
+        )
+
+    speedup = results["tuned"]["ops_per_sec"] / max(results["default"]["ops_per_sec"], 1e-9)
+    print(f"tuned vs default: {speedup:.2f}x throughput")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
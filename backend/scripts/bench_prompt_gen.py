@@ -0,0 +1,142 @@
+"""
+Prompt Generation Benchmark
+Compiled spintax engine vs the previous regex/str.replace implementation.
+
+Also checks, for every style/persona pair, that sampled prompts from both
+implementations fall within the compiled template's output space, so the
+speedup isn't bought with different output.
+
+Usage (from backend/):
+    python -m scripts.bench_prompt_gen [--n 20000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+
+# ── Previous implementation (for comparison only) ─────────────────────────
+
+def legacy_process_spintax(text: str) -> str:
+    pattern = r'\{([^{}]+)\}'
+
+    def replace_match(match):
+        options = match.group(1).split('|')
+        return random.choice(options)
+
+    for _ in range(3):
+        new_text = re.sub(pattern, replace_match, text)
+        if new_text == text:
+            break
+        text = new_text
+    return text
+
+
+def legacy_build_prompt(product_name: str, highlight: str, style: str, persona: str) -> str:
+    from core.prompt_gen import STYLE_TEMPLATES, PERSONAS, QUALITY_NOTES
+
+    style_template = STYLE_TEMPLATES.get(style, STYLE_TEMPLATES["showcase"])
+    persona_data = PERSONAS.get(persona, PERSONAS["product_only"])
+    person_desc = persona_data["person"] or ""
+
+    parts = []
+    intro = style_template["intro"]
+    if "{Person}" in intro:
+        intro = intro.replace("{Person}", person_desc or "The camera")
+    intro = intro.replace("{product_name}", product_name)
+    parts.append(intro)
+    parts.append(style_template["action"].replace("{product_name}", product_name))
+    parts.append(style_template["highlight"].replace("{highlight}", highlight))
+    if persona_data["person"]:
+        parts.append(f"in {persona_data['setting']}")
+    parts.append(style_template["close"])
+
+    prompt = ", ".join(parts) + "."
+    prompt += f" {random.choice(QUALITY_NOTES)}."
+    final_prompt = legacy_process_spintax(prompt)
+    return re.sub(r'\s+', ' ', final_prompt).strip()
+
+
+def legacy_generate_batch_prompts(product_name, highlight, style, persona, count=1) -> list:
+    prompts, seen = [], set()
+    attempts = 0
+    while len(prompts) < count and attempts < count * 10:
+        prompt = legacy_build_prompt(product_name, highlight, style, persona)
+        if prompt not in seen:
+            prompts.append(prompt)
+            seen.add(prompt)
+        attempts += 1
+    while len(prompts) < count:
+        prompts.append(prompts[-1])
+    return prompts
+
+
+# ─────────────────────────────────────────
+
+def _tree_pattern(sequence, values) -> str:
+    """Regex matching exactly the outputs a compiled tree can render"""
+    from core.spintax import Choice, Var
+
+    parts = []
+    for node in sequence:
+        if type(node) is Choice:
+            parts.append("(?:" + "|".join(_tree_pattern(option, values) for option in node) + ")")
+        elif type(node) is Var:
+            parts.append(re.escape(values[node]))
+        else:
+            parts.append(re.escape(node))
+    return "".join(parts)
+
+
+def check_equivalence(samples: int) -> bool:
+    """Sampled prompts from both implementations must be possible compiled outputs"""
+    from core.prompt_gen import STYLE_TEMPLATES, PERSONAS, build_prompt, compile_prompt
+
+    values = {"product_name": "Nike Air Max 270", "highlight": "super lightweight"}
+    ok = True
+    for style in STYLE_TEMPLATES:
+        for persona in PERSONAS:
+            matcher = re.compile(_tree_pattern(compile_prompt(style, persona).tree, values))
+            args = (values["product_name"], values["highlight"], style, persona)
+            old = {legacy_build_prompt(*args) for _ in range(samples)}
+            new = {build_prompt(*args) for _ in range(samples)}
+            bad = [p for p in old | new if not matcher.fullmatch(p)]
+            if bad:
+                ok = False
+                print(f"MISMATCH {style}/{persona}: {bad[0]}")
+    return ok
+
+
+def main(args):
+    from core.prompt_gen import build_prompt, generate_batch_prompts, process_spintax
+
+    print("equivalent output:", "OK" if check_equivalence(args.samples) else "FAILED")
+
+    prompt_args = ("Samsung Galaxy S24", "crystal clear camera with AI enhancement", "review", "hijabers")
+    nested = "{A|B {c|d {e|f}}} {g|h} " * 10
+    rng = random.Random(42)
+
+    cases = [
+        ("build_prompt", lambda: legacy_build_prompt(*prompt_args), lambda: build_prompt(*prompt_args, rng=rng)),
+        ("process_spintax", lambda: legacy_process_spintax(nested), lambda: process_spintax(nested, rng=rng)),
+        ("batch of 20",
+         lambda: legacy_generate_batch_prompts(*prompt_args, count=20),
+         lambda: generate_batch_prompts(*prompt_args, count=20, rng=rng)),
+    ]
+    for name, old, new in cases:
+        old_t = min(timeit.repeat(old, number=args.n, repeat=3))
+        new_t = min(timeit.repeat(new, number=args.n, repeat=3))
+        print(
+            f"{name:>16}: legacy {old_t / args.n * 1e6:7.2f} us  "
+            f"compiled {new_t / args.n * 1e6:7.2f} us  ({old_t / new_t:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=20000, help="Calls per timing run")
+    parser.add_argument("--samples", type=int, default=3000, help="Prompts per pair for the equivalence check")
+    main(parser.parse_args())
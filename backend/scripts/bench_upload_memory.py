@@ -0,0 +1,126 @@
+"""
+Base64 Upload Memory Benchmark
+Peak Python heap per request for the base64 upload path, old vs new.
+
+"legacy" reproduces the previous ImageHost.upload_base64 (split the data URI,
+rebuild it as an image/jpeg data URI, post form-encoded); "route" is what
+/api/upload-image-base64 runs now: decode_base64_image, then _store_image
+(dedupe lookup, normalization in the process pool, multipart upload of the
+spooled file, dedupe record). Cloudinary is replaced by a transport that
+reads and discards the body, the dedupe table lives in a temp SQLite file,
+and the input string itself is excluded from the measurement. The payload
+is a real JPEG of about --mb megabytes (random pixels, so it compresses
+like photo detail), so the normalize worker decodes, resizes and
+re-encodes it as it would a user's photo.
+
+Usage (from backend/):
+    python -m scripts.bench_upload_memory [--mb 10]
+"""
+import argparse
+import asyncio
+import base64
+import io
+import math
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import httpx
+from PIL import Image
+
+
+class _DiscardTransport(httpx.AsyncBaseTransport):
+    """Consumes the request body chunk by chunk like a real socket would"""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        sent = 0
+        async for chunk in request.stream:
+            sent += len(chunk)
+        return httpx.Response(200, json={"secure_url": "https://res.example/x.jpg", "public_id": "x", "bytes": sent})
+
+
+async def legacy_upload_base64(cloud_name: str, upload_preset: str, image_base64: str):
+    from core.http_client import get_http_client
+
+    if "," in image_base64:
+        image_base64 = image_base64.split(",")[1]
+    form_data = {
+        "file": f"data:image/jpeg;base64,{image_base64}",
+        "upload_preset": upload_preset,
+    }
+    response = await get_http_client().post(
+        f"https://api.cloudinary.com/v1_1/{cloud_name}/image/upload", data=form_data
+    )
+    return response.json()
+
+
+def _noise_jpeg(side: int) -> bytes:
+    image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def jpeg_payload(target: int):
+    """(data URI, decoded size) of a square noise JPEG close to target bytes"""
+    bytes_per_pixel = len(_noise_jpeg(256)) / (256 * 256)
+    data = _noise_jpeg(max(16, int(math.sqrt(target / bytes_per_pixel))))
+    return "data:image/jpeg;base64," + base64.b64encode(data).decode(), len(data)
+
+
+async def measure(label: str, upload, payload: str, size: int) -> int:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    await upload(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    extra = peak - base
+    print(f"{label:>10}: peak {extra / 1e6:7.1f} MB  ({extra / size:.2f}x image size)")
+    return extra
+
+
+async def main(args):
+    import core.http_client as http_client
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+    from core.database import build_engine
+    from core.image_host import ImageHost, close_image_pool
+    from core.migrations import run_migrations
+    from core.upload_stream import decode_base64_image
+    from routes.upload import _store_image
+
+    http_client._client = httpx.AsyncClient(transport=_DiscardTransport())
+    host = ImageHost(cloud_name="bench", upload_preset="bench")
+
+    engine = build_engine(f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    async with engine.begin() as conn:
+        await conn.run_sync(run_migrations)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def route_upload(payload: str):
+        image = decode_base64_image(payload)
+        async with session_factory() as db:
+            return await _store_image(host, image, None, None, db)
+
+    # Warm up: worker pool, DB connection and statement caches stay out of the measurement
+    await route_upload(jpeg_payload(64 * 1024)[0])
+
+    payload, size = jpeg_payload(int(args.mb * 1024 * 1024))
+    print(f"payload: {size / 1e6:.1f} MB JPEG")
+
+    legacy = await measure("legacy", lambda p: legacy_upload_base64("bench", "bench", p), payload, size)
+    route = await measure("route", route_upload, payload, size)
+    print(f"peak reduction: {legacy / max(route, 1):.1f}x")
+
+    close_image_pool()
+    await engine.dispose()
+    await http_client._client.aclose()
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mb", type=float, default=10, help="Decoded image size in MB")
+    asyncio.run(main(parser.parse_args()))
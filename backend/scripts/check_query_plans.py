@@ -0,0 +1,85 @@
+"""
+Query Plan Check
+Verifies the hot video_tasks queries use the indexes added by migrations,
+via SQLite's EXPLAIN QUERY PLAN on a scratch database.
+
+Usage (from backend/):
+    python -m scripts.check_query_plans
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import select, func, or_, and_
+from sqlalchemy.ext.asyncio import create_async_engine
+
+
+# Hot query name -> (statement builder, index it must use)
+def _hot_queries():
+    from core.database import ACTIVE_TASK_FILTER, VideoTask
+
+    now = datetime.utcnow()
+    return {
+        "history page": (
+            select(VideoTask.id, VideoTask.kie_task_id, VideoTask.status, VideoTask.created_at)
+            .where(VideoTask.user_id == 1)
+            .order_by(VideoTask.created_at.desc(), VideoTask.id.desc())
+            .limit(51),
+            "ix_video_tasks_user_created",
+        ),
+        "history next page": (
+            select(VideoTask.id, VideoTask.created_at)
+            .where(
+                VideoTask.user_id == 1,
+                or_(
+                    VideoTask.created_at < now,
+                    and_(VideoTask.created_at == now, VideoTask.id < 100)
+                )
+            )
+            .order_by(VideoTask.created_at.desc(), VideoTask.id.desc())
+            .limit(51),
+            "ix_video_tasks_user_created",
+        ),
+        "user status filter": (
+            select(func.count()).select_from(VideoTask)
+            .where(VideoTask.user_id == 1, VideoTask.status.in_(["pending", "processing"])),
+            "ix_video_tasks_user_status",
+        ),
+        "poller active tasks": (
+            select(VideoTask).where(ACTIVE_TASK_FILTER),
+            "ix_video_tasks_active",
+        ),
+    }
+
+
+async def check() -> bool:
+    from core.migrations import run_migrations
+
+    path = os.path.join(tempfile.mkdtemp(), "plans.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    ok = True
+
+    async with engine.begin() as conn:
+        await conn.run_sync(run_migrations)
+
+        for name, (stmt, index) in _hot_queries().items():
+            compiled = stmt.compile(conn.sync_connection, compile_kwargs={"render_postcompile": True})
+            params = compiled.params
+            plan = (await conn.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {compiled.string}",
+                tuple(params[k] for k in compiled.positiontup)
+            )).all()
+            details = " / ".join(row[-1] for row in plan)
+            used = index in details
+            ok = ok and used
+            print(f"[{'OK' if used else 'FAIL'}] {name}: {details}")
+
+    await engine.dispose()
+    return ok
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sys.exit(0 if asyncio.run(check()) else 1)
@@ -0,0 +1,57 @@
+"""
+Test fixtures: the app on a throwaway SQLite database, with background
+services that call out (Google certs prefetch, task poller, generation
+queue workers) switched off.
+
+Run from backend/:
+    python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# Must be set before any core module reads its config
+_DATA_DIR = tempfile.mkdtemp(prefix="aff-video-gen-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_DATA_DIR, 'test.db')}"
+os.environ["TASK_POLLER_ENABLED"] = "false"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from core.auth import GoogleCertCache
+    from core.generation_queue import GenerationQueue
+    import main
+
+    async def not_started(self):
+        pass
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(GoogleCertCache, "start", not_started)
+        patch.setattr(GenerationQueue, "start", not_started)
+        with TestClient(main.app) as test_client:
+            yield test_client
+
+
+@pytest.fixture
+def approved_user(client):
+    """(user id, auth headers) of a fresh approved user"""
+    from core.auth import create_jwt
+    from core.database import async_session, User
+
+    email = f"{uuid.uuid4().hex[:12]}@test.local"
+
+    async def create():
+        async with async_session() as db:
+            user = User(email=email, name="test", role="user", is_approved=True)
+            db.add(user)
+            await db.commit()
+            return user.id
+
+    user_id = client.portal.call(create)
+    return user_id, {"Authorization": f"Bearer {create_jwt(user_id, email, 'user')}"}
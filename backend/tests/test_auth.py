@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+from sqlalchemy import select, update
+
+import core.auth
+from core.auth import (
+    GoogleCertCache, GOOGLE_CERTS_MIN_FORCED_INTERVAL, invalidate_user_cache, user_cache_sync,
+    verify_google_token, USER_CACHE_VERSION
+)
+from core.database import async_session, CacheVersion, User
+
+
+def _revoke_elsewhere(client, user_id):
+    """What another worker's reject_user leaves behind: the row and the shared version changed"""
+    async def revoke():
+        async with async_session() as db:
+            await db.execute(update(User).where(User.id == user_id).values(is_approved=False))
+            row = (await db.execute(
+                select(CacheVersion).where(CacheVersion.name == USER_CACHE_VERSION)
+            )).scalar_one_or_none()
+            if row is None:
+                db.add(CacheVersion(name=USER_CACHE_VERSION, version=1))
+            else:
+                row.version += 1
+            await db.commit()
+
+    client.portal.call(revoke)
+
+
+def test_user_revoked_by_another_worker_is_dropped_from_cache(client, approved_user):
+    user_id, headers = approved_user
+    client.portal.call(user_cache_sync.check)
+    assert client.get("/api/tasks", headers=headers).status_code == 200
+
+    _revoke_elsewhere(client, user_id)
+    # Still served from this worker's cache until the sync notices
+    assert client.get("/api/tasks", headers=headers).status_code == 200
+
+    client.portal.call(user_cache_sync.check)
+    assert client.get("/api/tasks", headers=headers).status_code == 403
+
+
+def test_local_invalidation_bumps_shared_version(client, approved_user):
+    user_id, headers = approved_user
+
+    async def version():
+        async with async_session() as db:
+            return (await db.execute(
+                select(CacheVersion.version).where(CacheVersion.name == USER_CACHE_VERSION)
+            )).scalar() or 0
+
+    before = client.portal.call(version)
+
+    async def reject():
+        async with async_session() as db:
+            await db.execute(update(User).where(User.id == user_id).values(is_approved=False))
+            await invalidate_user_cache(db, user_id)
+            await db.commit()
+
+    client.portal.call(reject)
+    assert client.portal.call(version) == before + 1
+    assert client.get("/api/tasks", headers=headers).status_code == 403
+
+
+def _token_signed_with(key_id):
+    return jwt.encode({"sub": "1"}, "secret", algorithm="HS256", headers={"kid": key_id})
+
+
+def test_unknown_key_ids_force_at_most_one_cert_fetch_per_interval(monkeypatch):
+    certs = GoogleCertCache()
+    fetches = []
+
+    async def refresh(self):
+        fetches.append(time.monotonic())
+        self._certs = {"current-key": "-----BEGIN CERTIFICATE-----"}
+        self._refreshed_at = time.monotonic()
+        self._expires_at = self._refreshed_at + 3600
+        return self._certs
+
+    monkeypatch.setattr(GoogleCertCache, "refresh", refresh)
+    monkeypatch.setattr(core.auth, "google_certs", certs)
+
+    def rejected(key_id):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(verify_google_token(_token_signed_with(key_id)))
+        return error.value.status_code == 401
+
+    # Initial load only; the certs were just fetched
+    assert rejected("made-up-1")
+    assert rejected("made-up-2")
+    assert len(fetches) == 1
+
+    # Past the interval one unknown key may refetch (Google rotated), the next may not
+    certs._refreshed_at -= GOOGLE_CERTS_MIN_FORCED_INTERVAL + 1
+    assert rejected("made-up-3")
+    assert rejected("made-up-4")
+    assert len(fetches) == 2
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from core.database import async_session, GenerationJob, VideoTask
+from core.generation_queue import generation_queue, placeholder_task_id
+
+
+def _orphaned_job(client, user_id, sent):
+    """A running job whose worker died (lease expired)"""
+    now = datetime.utcnow()
+
+    async def add():
+        async with async_session() as db:
+            job_id = (await db.execute(insert(GenerationJob).values(
+                user_id=user_id,
+                batch_id="batch",
+                prompt="prompt",
+                image_url="https://img.example/x.jpg",
+                status="running",
+                attempts=1,
+                locked_until=now - timedelta(seconds=1),
+                sent_at=now - timedelta(seconds=30) if sent else None,
+            ))).inserted_primary_key[0]
+            await db.commit()
+            return job_id
+
+    return client.portal.call(add)
+
+
+def _job(client, job_id):
+    async def get():
+        async with async_session() as db:
+            return await db.get(GenerationJob, job_id)
+
+    return client.portal.call(get)
+
+
+def test_orphaned_job_that_was_sent_fails_instead_of_being_recreated(client, approved_user):
+    user_id, _ = approved_user
+    job_id = _orphaned_job(client, user_id, sent=True)
+
+    assert client.portal.call(generation_queue.claim) is None
+
+    job = _job(client, job_id)
+    assert job.status == "failed"
+    assert "may still have created" in job.error
+
+    async def placeholder():
+        async with async_session() as db:
+            return (await db.execute(
+                select(VideoTask.status).where(VideoTask.kie_task_id == placeholder_task_id(job_id))
+            )).scalar_one()
+
+    assert client.portal.call(placeholder) == "failed"
+
+
+def test_orphaned_job_that_was_not_sent_is_retried(client, approved_user):
+    user_id, _ = approved_user
+    job_id = _orphaned_job(client, user_id, sent=False)
+
+    claimed = client.portal.call(generation_queue.claim)
+
+    assert claimed.id == job_id
+    assert claimed.attempts == 2
+    assert _job(client, job_id).status == "running"
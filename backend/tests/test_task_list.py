@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from core.database import async_session, VideoTask
+
+
+def _add_task(client, user_id, kie_task_id, created_at):
+    async def add():
+        async with async_session() as db:
+            db.add(VideoTask(user_id=user_id, kie_task_id=kie_task_id, status="completed", created_at=created_at))
+            await db.commit()
+
+    client.portal.call(add)
+
+
+def _listed(client, headers, **params):
+    response = client.get("/api/tasks", params=params, headers=headers)
+    assert response.status_code == 200
+    return [task["task_id"] for task in response.json()["tasks"]]
+
+
+def test_created_range_accepts_utc_z_timestamps(client, approved_user):
+    user_id, headers = approved_user
+    _add_task(client, user_id, "at-10", datetime(2026, 1, 1, 10, 0))
+    _add_task(client, user_id, "at-12", datetime(2026, 1, 1, 12, 0))
+
+    assert _listed(client, headers, created_from="2026-01-01T11:00:00Z") == ["at-12"]
+    assert _listed(client, headers, created_to="2026-01-01T11:00:00Z") == ["at-10"]
+
+
+def test_created_range_converts_offsets_to_utc(client, approved_user):
+    user_id, headers = approved_user
+    _add_task(client, user_id, "at-10", datetime(2026, 1, 1, 10, 0))
+
+    # 11:30+02:00 is 09:30 UTC, before the task
+    assert _listed(client, headers, created_from="2026-01-01T11:30:00+02:00") == ["at-10"]
+    assert _listed(client, headers, created_to="2026-01-01T11:30:00+02:00") == []
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import delete, update
+
+from core.database import async_session, UserApiKey
+from core.encryption import encrypt_value
+from core.user_keys import ApiKeyMissing, get_kie_clients, get_user_kie_key
+
+
+def _write_key(client, user_id, kie_key):
+    """Save a key the way another worker would: no local invalidation"""
+    async def write():
+        async with async_session() as db:
+            if kie_key is None:
+                await db.execute(delete(UserApiKey).where(UserApiKey.user_id == user_id))
+            else:
+                updated = await db.execute(
+                    update(UserApiKey).where(UserApiKey.user_id == user_id)
+                    .values(kie_api_key=encrypt_value(kie_key))
+                )
+                if not updated.rowcount:
+                    db.add(UserApiKey(user_id=user_id, kie_api_key=encrypt_value(kie_key)))
+            await db.commit()
+
+    client.portal.call(write)
+
+
+def _lookup(client, user_id):
+    async def lookup():
+        async with async_session() as db:
+            return await get_user_kie_key(db, user_id)
+
+    return client.portal.call(lookup)
+
+
+def _clients(client, user_id):
+    async def lookup():
+        async with async_session() as db:
+            return await get_kie_clients(db, [user_id])
+
+    return client.portal.call(lookup)
+
+
+def test_cached_key_follows_changes_made_by_other_workers(client, approved_user):
+    user_id, _ = approved_user
+    _write_key(client, user_id, "first-key")
+    first = _lookup(client, user_id)
+    assert first.key.get_secret_value() == "first-key"
+    assert _lookup(client, user_id) is first
+
+    _write_key(client, user_id, "rotated-key")
+    assert _lookup(client, user_id).key.get_secret_value() == "rotated-key"
+    assert _clients(client, user_id)[user_id] is _lookup(client, user_id).client
+
+    _write_key(client, user_id, None)
+    with pytest.raises(ApiKeyMissing):
+        _lookup(client, user_id)
+    assert _clients(client, user_id) == {}
@@ -6,11 +6,45 @@ import { api } from '@/lib/api'
 import { useAuth } from '@/lib/auth'
 import { useRouter } from 'next/navigation'
 
+const BATCH_POLL_MS = 3000
+// Stop following a batch after this long (the history fetch catches up later)
+const BATCH_FOLLOW_MAX_MS = 10 * 60 * 1000
+
 export function GenerateButton() {
     const { form, isGenerating, setIsGenerating, addTask, refreshCredits } = useAppStore()
     const { isAuthenticated, isApproved } = useAuth()
     const router = useRouter()
 
+    // Queued prompts become tasks in the background. The live stream usually
+    // delivers them, but not while it is down or when another worker/replica
+    // ran the jobs, so poll the batch until nothing is pending.
+    const followBatch = async (batchId: string) => {
+        const deadline = Date.now() + BATCH_FOLLOW_MAX_MS
+        while (Date.now() < deadline) {
+            await new Promise((resolve) => setTimeout(resolve, BATCH_POLL_MS))
+            try {
+                const batch = await api.getGenerationBatch(batchId)
+                if (!batch.jobs) return
+
+                batch.jobs.forEach((job) => {
+                    if (!job.task_id) return
+                    addTask({
+                        id: job.task_id,
+                        status: job.status === 'failed' ? 'failed' : 'pending',
+                        progress: 0,
+                        videoUrl: null,
+                        thumbnailUrl: null,
+                        error: job.status === 'failed' ? job.error : null,
+                        createdAt: new Date(),
+                    })
+                })
+                if (batch.pending === 0) return
+            } catch (err) {
+                console.error('Batch status error:', err)
+            }
+        }
+    }
+
     const canGenerate =
         form.imageUrl &&
         form.productName.trim() &&
@@ -40,8 +74,11 @@ export function GenerateButton() {
                 removeWatermark: form.removeWatermark,
             })
 
-            if (result.success && result.task_ids) {
-                result.task_ids.forEach((taskId) => {
+            if (result.success) {
+                if (result.batch_id) {
+                    followBatch(result.batch_id)
+                }
+                result.task_ids?.forEach((taskId) => {
                     addTask({
                         id: taskId,
                         status: 'pending',
@@ -34,7 +34,8 @@ export function ImageUploader() {
         reader.readAsDataURL(file)
 
         try {
-            const result = await api.uploadImage(file)
+            // Prefer direct-to-Cloudinary; fall back to uploading via the API
+            const result = (await api.uploadImageDirect(file)) ?? (await api.uploadImage(file))
 
             if (result.success && result.url) {
                 setForm({ imageUrl: result.url })
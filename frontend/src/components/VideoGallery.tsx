@@ -1,16 +1,16 @@
 'use client'
 
-import { Download, Film, Calendar } from 'lucide-react'
+import { Download, Film, Calendar, Loader2 } from 'lucide-react'
 import { useAppStore, VideoTask } from '@/lib/store'
 
 export function VideoGallery() {
-    const { queue } = useAppStore()
+    const { queue, historyCursor, isLoadingHistory, loadMoreHistory } = useAppStore()
 
     const completedTasks = queue.filter((t) => t.status === 'completed').sort((a, b) =>
         new Date(b.createdAt).getTime() - new Date(a.createdAt).getTime()
     )
 
-    if (completedTasks.length === 0) {
+    if (completedTasks.length === 0 && !historyCursor) {
         return null
     }
 
@@ -29,6 +29,17 @@ export function VideoGallery() {
                     <VideoHistoryCard key={task.id} task={task} />
                 ))}
             </div>
+
+            {historyCursor && (
+                <button
+                    onClick={loadMoreHistory}
+                    disabled={isLoadingHistory}
+                    className="w-full py-3 rounded-xl bg-slate-800/50 border border-slate-700 text-slate-300 hover:border-purple-500/50 hover:text-white transition-all flex items-center justify-center gap-2 disabled:opacity-60"
+                >
+                    {isLoadingHistory && <Loader2 size={16} className="animate-spin" />}
+                    Muat lebih banyak
+                </button>
+            )}
         </div>
     )
 }
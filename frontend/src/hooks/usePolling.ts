@@ -1,18 +1,29 @@
 /**
  * Polling hook for checking video task status
- * Fetches history from backend and syncs active tasks
+ * Fetches the newest history page from backend, then follows live updates
+ * over SSE; older pages load on demand (store.loadMoreHistory).
+ * While the live stream is down, running tasks are polled by ID
+ * (bulk status endpoint) instead of refetching the history.
  */
-import { useEffect, useRef, useCallback } from 'react'
-import { useAppStore, TaskStatus, VideoTask } from '@/lib/store'
+import { useEffect, useRef, useCallback, useState } from 'react'
+import { useAppStore, TaskStatus, VideoTask, HISTORY_PAGE_SIZE, taskFromApi } from '@/lib/store'
 import { useAuth } from '@/lib/auth'
-import { api } from '@/lib/api'
+import { api, TaskDelta } from '@/lib/api'
+
+const STREAM_RETRY_MS = 5000
+// Backend STATUS_BATCH_MAX
+const STATUS_BATCH_MAX = 100
+
+const isDone = (status: TaskStatus) => status === 'completed' || status === 'failed'
 
 export function usePolling(intervalMs: number = 5000) {
-    const { queue, setQueue, refreshCredits } = useAppStore()
+    const { queue, setQueue, setHistoryCursor, addTask, updateTask, refreshCredits } = useAppStore()
     const { isAuthenticated, isApproved } = useAuth()
     const intervalRef = useRef<NodeJS.Timeout | null>(null)
     const isPollingRef = useRef(false)
     const prevQueueRef = useRef<VideoTask[]>([])
+    const historyLoadedRef = useRef(false)
+    const [isStreaming, setIsStreaming] = useState(false)
 
     const fetchTasks = useCallback(async () => {
         if (!isAuthenticated || !isApproved) return
@@ -22,19 +33,15 @@ export function usePolling(intervalMs: number = 5000) {
         isPollingRef.current = true
 
         try {
-            const result = await api.getTasks()
+            const result = await api.getTasks({ limit: HISTORY_PAGE_SIZE })
+
+            // 304: nothing changed server-side since the last fetch (the first
+            // fetch after a remount still needs the cached page in the store)
+            if (result.notModified && historyLoadedRef.current) return
 
             if (result.tasks) {
-                // Map API tasks to Store tasks
-                const mappedTasks: VideoTask[] = result.tasks.map((t) => ({
-                    id: t.task_id,
-                    status: t.status as TaskStatus,
-                    progress: t.progress,
-                    videoUrl: t.video_url,
-                    thumbnailUrl: t.thumbnail_url,
-                    error: t.error,
-                    createdAt: t.created_at ? new Date(t.created_at) : new Date(),
-                }))
+                // Newest page only; older pages come from "load more"
+                const mappedTasks: VideoTask[] = result.tasks.map(taskFromApi)
 
                 // Check for completion/failure events to refresh credits
                 // triggers if a task was NOT completed/failed before, but IS now
@@ -51,16 +58,28 @@ export function usePolling(intervalMs: number = 5000) {
                     refreshCredits()
                 }
 
-                // Update store
-                setQueue(mappedTasks)
-                prevQueueRef.current = mappedTasks
+                // Update store: on resync, keep the older pages already loaded
+                let olderTasks: VideoTask[] = []
+                if (historyLoadedRef.current) {
+                    const pageIds = new Set(mappedTasks.map((t) => t.id))
+                    const oldest = mappedTasks[mappedTasks.length - 1]
+                    olderTasks = useAppStore.getState().queue.filter((t) =>
+                        oldest !== undefined && !pageIds.has(t.id) && t.createdAt.getTime() < oldest.createdAt.getTime()
+                    )
+                } else {
+                    historyLoadedRef.current = true
+                    setHistoryCursor(result.next_cursor ?? null)
+                }
+                const merged = [...mappedTasks, ...olderTasks]
+                setQueue(merged)
+                prevQueueRef.current = merged
             }
         } catch (error) {
             console.error('Task fetch error:', error)
         } finally {
             isPollingRef.current = false
         }
-    }, [isAuthenticated, isApproved, setQueue, refreshCredits])
+    }, [isAuthenticated, isApproved, setQueue, setHistoryCursor, refreshCredits])
 
     // Initial fetch on mount / auth
     useEffect(() => {
@@ -69,15 +88,84 @@ export function usePolling(intervalMs: number = 5000) {
         }
     }, [isAuthenticated, isApproved, fetchTasks])
 
-    // Polling logic
+    // Apply one live delta to the store
+    const applyDelta = useCallback((delta: TaskDelta) => {
+        const task = taskFromApi(delta)
+
+        const existing = useAppStore.getState().queue.find((t) => t.id === task.id)
+        if (existing) {
+            updateTask(task.id, task)
+            if (isDone(task.status) && !isDone(existing.status)) {
+                refreshCredits()
+            }
+        } else {
+            addTask(task)
+        }
+        prevQueueRef.current = useAppStore.getState().queue
+    }, [addTask, updateTask, refreshCredits])
+
+    // Fallback poll: only the tasks still running, via the bulk status endpoint
+    const refreshActive = useCallback(async () => {
+        if (!isAuthenticated || !isApproved) return
+        if (isPollingRef.current) return
+
+        const activeIds = useAppStore.getState().queue
+            .filter((t) => !isDone(t.status))
+            .map((t) => t.id)
+            .slice(0, STATUS_BATCH_MAX)
+        if (activeIds.length === 0) return
+
+        isPollingRef.current = true
+        try {
+            const result = await api.checkStatus(activeIds)
+            result.tasks?.forEach((t) => applyDelta(t))
+        } catch (error) {
+            console.error('Task status error:', error)
+        } finally {
+            isPollingRef.current = false
+        }
+    }, [isAuthenticated, isApproved, applyDelta])
+
+    // Live updates over SSE, reconnecting (and resyncing) when the stream drops
+    useEffect(() => {
+        if (!isAuthenticated || !isApproved) return
+
+        const controller = new AbortController()
+        let retryTimer: NodeJS.Timeout | null = null
+
+        const connect = () => {
+            setIsStreaming(true)
+            api.streamTasks(applyDelta, controller.signal)
+                .catch((error) => {
+                    if (!controller.signal.aborted) {
+                        console.error('Task stream error:', error)
+                    }
+                })
+                .finally(() => {
+                    setIsStreaming(false)
+                    if (!controller.signal.aborted) {
+                        fetchTasks()
+                        retryTimer = setTimeout(connect, STREAM_RETRY_MS)
+                    }
+                })
+        }
+        connect()
+
+        return () => {
+            controller.abort()
+            if (retryTimer) clearTimeout(retryTimer)
+        }
+    }, [isAuthenticated, isApproved, applyDelta, fetchTasks])
+
+    // Polling logic (fallback while the live stream is down)
     useEffect(() => {
         const hasActiveTasks = queue.some(
             (t) => t.status === 'pending' || t.status === 'queued' || t.status === 'processing'
         )
 
-        if (isAuthenticated && isApproved && hasActiveTasks) {
+        if (isAuthenticated && isApproved && hasActiveTasks && !isStreaming) {
             if (!intervalRef.current) {
-                intervalRef.current = setInterval(fetchTasks, intervalMs)
+                intervalRef.current = setInterval(refreshActive, intervalMs)
             }
         } else {
             if (intervalRef.current) {
@@ -92,7 +180,7 @@ export function usePolling(intervalMs: number = 5000) {
                 intervalRef.current = null
             }
         }
-    }, [queue, isAuthenticated, isApproved, intervalMs, fetchTasks])
+    }, [queue, isAuthenticated, isApproved, isStreaming, intervalMs, refreshActive])
 
     return { refresh: fetchTasks }
 }
@@ -5,6 +5,22 @@
 
 const API_BASE = process.env.NEXT_PUBLIC_API_URL ?? 'http://localhost:8000'
 
+export interface TaskDelta {
+    task_id: string
+    status: string
+    progress: number
+    video_url: string | null
+    thumbnail_url: string | null
+    error: string | null
+    created_at: string | null
+}
+
+export interface TaskListPage {
+    tasks: TaskDelta[]
+    next_cursor?: string | null
+    total?: number | null
+}
+
 interface AuthUser {
     id: number
     email: string
@@ -17,12 +33,15 @@ interface AuthUser {
 class ApiClient {
     private baseUrl: string
     private token: string | null = null
+    // Last page + ETag per /api/tasks URL, for conditional polling
+    private taskListCache = new Map<string, { etag: string; data: TaskListPage }>()
 
     constructor(baseUrl: string = API_BASE) {
         this.baseUrl = baseUrl
     }
 
     setToken(token: string | null) {
+        if (token !== this.token) this.taskListCache.clear()
         this.token = token
     }
 
@@ -101,12 +120,15 @@ class ApiClient {
         return response.json()
     }
 
-    async getCreditBalance(): Promise<{
+    async getCreditBalance(refresh = false): Promise<{
         success: boolean
         credits?: number
+        cached?: boolean
+        age_seconds?: number
         error?: string
     }> {
-        const response = await fetch(`${this.baseUrl}/api/user/credit-balance`, {
+        const query = refresh ? '?refresh=true' : ''
+        const response = await fetch(`${this.baseUrl}/api/user/credit-balance${query}`, {
             headers: this.authHeaders(),
             credentials: 'include',
         })
@@ -196,6 +218,79 @@ class ApiClient {
         }
     }
 
+    /**
+     * Upload straight to Cloudinary with a signature from our backend, so the
+     * image bytes never pass through the API. Returns null when direct uploads
+     * aren't configured (caller falls back to uploadImage).
+     */
+    async uploadImageDirect(
+        file: File
+    ): Promise<{ success: boolean; url?: string; error?: string } | null> {
+        try {
+            const signResponse = await fetch(`${this.baseUrl}/api/upload-signature`, {
+                method: 'POST',
+                headers: this.authHeaders(),
+                credentials: 'include',
+            })
+            if (!signResponse.ok) return null
+            const signed: {
+                success: boolean
+                upload_url?: string
+                params?: Record<string, string | number>
+                max_bytes?: number
+            } = await signResponse.json()
+            if (!signed.success || !signed.upload_url || !signed.params) return null
+
+            if (signed.max_bytes && file.size > signed.max_bytes) {
+                return { success: false, error: 'File too large. Max 10MB allowed.' }
+            }
+
+            const formData = new FormData()
+            for (const [key, value] of Object.entries(signed.params)) {
+                formData.append(key, String(value))
+            }
+            formData.append('file', file)
+
+            const uploadResponse = await fetch(signed.upload_url, { method: 'POST', body: formData })
+            const uploaded = await uploadResponse.json()
+            if (!uploadResponse.ok) {
+                return { success: false, error: uploaded.error?.message || 'Upload failed' }
+            }
+
+            const finalizeResponse = await fetch(`${this.baseUrl}/api/upload-finalize`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    ...this.authHeaders(),
+                },
+                body: JSON.stringify({
+                    public_id: uploaded.public_id,
+                    version: uploaded.version,
+                    signature: uploaded.signature,
+                    secure_url: uploaded.secure_url,
+                    format: uploaded.format,
+                    bytes: uploaded.bytes,
+                    width: uploaded.width,
+                    height: uploaded.height,
+                }),
+                credentials: 'include',
+            })
+            const data = await finalizeResponse.json()
+            if (!finalizeResponse.ok) {
+                return {
+                    success: false,
+                    error: typeof data.detail === 'string' ? data.detail : 'Upload failed',
+                }
+            }
+            return data
+        } catch (err) {
+            return {
+                success: false,
+                error: err instanceof Error ? err.message : 'Network error during upload',
+            }
+        }
+    }
+
     // ── Generate ──────────────────────
 
     async previewPrompt(data: {
@@ -234,7 +329,7 @@ class ApiClient {
             batchCount: number
             removeWatermark: boolean
         }
-    ): Promise<{ success: boolean; task_ids?: string[]; error?: string }> {
+    ): Promise<{ success: boolean; task_ids?: string[]; batch_id?: string; queued?: number; error?: string }> {
         const response = await fetch(`${this.baseUrl}/api/generate-task`, {
             method: 'POST',
             headers: {
@@ -258,46 +353,131 @@ class ApiClient {
         return response.json()
     }
 
+    // Progress of a queued batch; finished jobs carry the ID of their task (a placeholder if creation failed)
+    async getGenerationBatch(batchId: string): Promise<{
+        batch_id: string
+        pending: number
+        jobs: { index: number; status: string; attempts: number; task_id: string | null; error: string | null }[]
+    }> {
+        const response = await fetch(`${this.baseUrl}/api/generate-jobs/${encodeURIComponent(batchId)}`, {
+            headers: this.authHeaders(),
+            credentials: 'include',
+        })
+
+        return response.json()
+    }
+
     // ── Status ────────────────────────
 
+    // Status of specific tasks (running ones are refreshed from Kie.ai server-side)
     async checkStatus(
-        taskIds: string[]
+        taskIds: string[],
+        refresh: boolean = true
     ): Promise<{
-        tasks: Array<{
-            task_id: string
-            status: string
-            progress: number
-            video_url: string | null
-            thumbnail_url: string | null
-            error: string | null
-        }>
+        tasks: TaskDelta[]
+        missing: string[]
+        refreshed: number
+        timed_out: number
     }> {
-        const ids = taskIds.join(',')
-        const response = await fetch(`${this.baseUrl}/api/status?ids=${encodeURIComponent(ids)}`, {
-            method: 'GET',
-            headers: this.authHeaders(),
+        const response = await fetch(`${this.baseUrl}/api/tasks/status`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                ...this.authHeaders(),
+            },
+            body: JSON.stringify({ task_ids: taskIds, refresh }),
             credentials: 'include',
         })
 
         return response.json()
     }
-    async getTasks(): Promise<{
-        tasks: Array<{
-            task_id: string
-            status: string
-            progress: number
-            video_url: string | null
-            thumbnail_url: string | null
-            error: string | null
-            created_at: string | null
-        }>
-    }> {
-        const response = await fetch(`${this.baseUrl}/api/tasks`, {
+    async getTasks(params: {
+        cursor?: string
+        limit?: number
+        status?: string[]
+        style?: string
+        product?: string
+        includeTotal?: boolean
+    } = {}): Promise<TaskListPage & { notModified?: boolean }> {
+        const query = new URLSearchParams()
+        if (params.cursor) query.set('cursor', params.cursor)
+        if (params.limit) query.set('limit', String(params.limit))
+        params.status?.forEach((s) => query.append('status', s))
+        if (params.style) query.set('style', params.style)
+        if (params.product) query.set('product', params.product)
+        if (params.includeTotal) query.set('include_total', 'true')
+        const qs = query.toString()
+
+        const url = `${this.baseUrl}/api/tasks${qs ? `?${qs}` : ''}`
+
+        // Revalidate with the last ETag for this URL; 304 means reuse the cached page
+        const cached = this.taskListCache.get(url)
+        const response = await fetch(url, {
             method: 'GET',
-            headers: this.authHeaders(),
+            headers: {
+                ...this.authHeaders(),
+                ...(cached ? { 'If-None-Match': cached.etag } : {}),
+            },
             credentials: 'include',
+            cache: 'no-store',
         })
-        return response.json()
+        if (response.status === 304 && cached) {
+            return { ...cached.data, notModified: true }
+        }
+
+        const data = await response.json()
+        const etag = response.headers.get('ETag')
+        if (response.ok && etag) {
+            this.taskListCache.set(url, { etag, data })
+        } else {
+            this.taskListCache.delete(url)
+        }
+        return data
+    }
+
+    /**
+     * Subscribe to live task deltas (Server-Sent Events).
+     * Uses fetch streaming instead of EventSource so the Authorization header is sent.
+     * Resolves when the server closes the stream; abort with the signal.
+     */
+    async streamTasks(onTask: (task: TaskDelta) => void, signal: AbortSignal): Promise<void> {
+        const response = await fetch(`${this.baseUrl}/api/tasks/stream`, {
+            headers: {
+                Accept: 'text/event-stream',
+                ...this.authHeaders(),
+            },
+            credentials: 'include',
+            signal,
+        })
+        if (!response.ok || !response.body) {
+            throw new Error(`Task stream failed: ${response.status}`)
+        }
+
+        const reader = response.body.getReader()
+        const decoder = new TextDecoder()
+        let buffer = ''
+
+        while (true) {
+            const { value, done } = await reader.read()
+            if (done) break
+            buffer += decoder.decode(value, { stream: true })
+
+            // Events are separated by a blank line; comments (keep-alives) have no data
+            let sep = buffer.indexOf('\n\n')
+            while (sep !== -1) {
+                const block = buffer.slice(0, sep)
+                buffer = buffer.slice(sep + 2)
+                const data = block
+                    .split('\n')
+                    .filter((line) => line.startsWith('data:'))
+                    .map((line) => line.slice(5).trimStart())
+                    .join('\n')
+                if (data) {
+                    onTask(JSON.parse(data))
+                }
+                sep = buffer.indexOf('\n\n')
+            }
+        }
     }
 }
 
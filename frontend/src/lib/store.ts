@@ -47,6 +47,12 @@ interface AppState {
     clearCompleted: () => void
     setQueue: (tasks: VideoTask[]) => void
 
+    // History paging: next_cursor of the oldest loaded page (null once all is loaded)
+    historyCursor: string | null
+    setHistoryCursor: (cursor: string | null) => void
+    isLoadingHistory: boolean
+    loadMoreHistory: () => Promise<void>
+
     // UI
     isGenerating: boolean
     setIsGenerating: (val: boolean) => void
@@ -55,7 +61,21 @@ interface AppState {
     refreshCredits: () => Promise<void>
 }
 
-import { api } from '@/lib/api' // Add import at top
+import { api, TaskDelta } from '@/lib/api' // Add import at top
+
+// Rows per history page (backend allows up to TASKS_MAX_PAGE_SIZE)
+export const HISTORY_PAGE_SIZE = 50
+
+// Map an API task row to a store task
+export const taskFromApi = (t: TaskDelta): VideoTask => ({
+    id: t.task_id,
+    status: t.status as TaskStatus,
+    progress: t.progress,
+    videoUrl: t.video_url,
+    thumbnailUrl: t.thumbnail_url,
+    error: t.error,
+    createdAt: t.created_at ? new Date(t.created_at) : new Date(),
+})
 
 const defaultForm: FormData = {
     imageUrl: null,
@@ -72,7 +92,7 @@ const defaultForm: FormData = {
 
 export const useAppStore = create<AppState>()(
     persist(
-        (set) => ({
+        (set, get) => ({
             // Form
             form: defaultForm,
             setForm: (updates) => set((state) => ({
@@ -82,9 +102,12 @@ export const useAppStore = create<AppState>()(
 
             // Queue
             queue: [],
-            addTask: (task) => set((state) => ({
-                queue: [...state.queue, task]
-            })),
+            addTask: (task) => set((state) => (
+                // Live updates may already have added this task
+                state.queue.some((t) => t.id === task.id)
+                    ? state
+                    : { queue: [...state.queue, task] }
+            )),
             updateTask: (id, updates) => set((state) => ({
                 queue: state.queue.map((t) => t.id === id ? { ...t, ...updates } : t)
             })),
@@ -96,6 +119,34 @@ export const useAppStore = create<AppState>()(
             })),
             setQueue: (tasks: VideoTask[]) => set({ queue: tasks }),
 
+            // History paging
+            historyCursor: null,
+            setHistoryCursor: (cursor) => set({ historyCursor: cursor }),
+            isLoadingHistory: false,
+            loadMoreHistory: async () => {
+                const { historyCursor, isLoadingHistory } = get()
+                if (!historyCursor || isLoadingHistory) return
+
+                set({ isLoadingHistory: true })
+                try {
+                    const result = await api.getTasks({ cursor: historyCursor, limit: HISTORY_PAGE_SIZE })
+                    const tasks = result.tasks
+                    if (tasks) {
+                        set((state) => {
+                            const known = new Set(state.queue.map((t) => t.id))
+                            return {
+                                queue: [...state.queue, ...tasks.map(taskFromApi).filter((t) => !known.has(t.id))],
+                                historyCursor: result.next_cursor ?? null,
+                            }
+                        })
+                    }
+                } catch (error) {
+                    console.error('Failed to load older tasks:', error)
+                } finally {
+                    set({ isLoadingHistory: false })
+                }
+            },
+
             // UI
             isGenerating: false,
             setIsGenerating: (val) => set({ isGenerating: val }),